@@ -0,0 +1,142 @@
+"""
+Benchmark data_to_nested on a synthetic schema with many fields.
+
+Compares the previous implementation, copied unchanged from the release
+before path tuples, which split component ids on '-' and merged single-key
+dicts level by level, with the path based single pass. Tag values are given
+in the TagInput format, which the previous implementation requires.
+
+    python benchmarks/bench_data_to_nested.py --fields 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+import dash
+import dash_html_components as html
+
+from json_schema_to_dash_forms import SchemaFormContainer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import timeit  # noqa: E402
+from schema_generator import make_schema, field_value  # noqa: E402
+
+# Fields of each root form of the schema: name, FIELDS fields and ARRAY_ITEMS
+# entries of an array of subforms with a name and FIELDS // 2 fields
+FIELDS = 50
+ARRAY_ITEMS = 5
+FORM_FIELDS = 1 + FIELDS + ARRAY_ITEMS * (1 + FIELDS // 2)
+
+
+def legacy_data_to_nested(data, root_path=None):
+    """
+    SchemaFormContainer.data_to_nested as released before path tuples, with
+    the container data and root path as arguments instead of attributes.
+
+    Entries of arrays of subforms are appended only when their index is the
+    length of the list so far, so every entry needs a value in a field read
+    before those of the next entries, and tag lists must hold the
+    {'index', 'displayValue'} dicts of TagInput.
+    """
+    dicts_list = list()
+    output = dict()
+    empty_required_fields = list()
+    alert_children = [
+        html.H4("There are missing required fields:", className="alert-heading"),
+        html.Hr()
+    ]
+
+    for k, v in data.items():
+        field_value = v['value']
+        if v['required'] and (field_value is None or (isinstance(field_value, str) and field_value.isspace()) or field_value == '' or (str(field_value) == str(root_path))):
+            empty_required_fields.append(k)
+            alert_children.append(html.A(
+                k,
+                href="#" + 'wrapper-' + v['compound_id']['index'] + '-' + v['compound_id']['type'],
+                className="alert-link"
+            ))
+            alert_children.append(html.Hr())
+        if field_value not in ['', None]:
+            splited_keys = k.split('-')
+            master_key_name = splited_keys[0]
+            field_name = splited_keys[-1]
+
+            for element in reversed(splited_keys):
+                if element == field_name:
+                    curr_dict = {field_name: v['value']}
+                elif element != master_key_name:
+                    curr_dict = {element: curr_dict}
+                else:
+                    dicts_list.append(curr_dict)
+
+    for e in dicts_list:
+        master_key_name = list(e.keys())[0]
+        output = legacy_create_nested_dict(
+            data=e,
+            output=output,
+            master_key_name=master_key_name
+        )
+
+    if len(empty_required_fields) > 0:
+        return alert_children, output
+    else:
+        return None, output
+
+
+def legacy_create_nested_dict(data, output, master_key_name):
+    """SchemaFormContainer._create_nested_dict as released before path tuples"""
+    for k, v in data.items():
+        if isinstance(v, dict):
+            if isinstance(output, list) or k not in output:
+                if list(v.keys())[0].isdigit():
+                    output[k] = list()
+                elif k.isdigit() and int(k) == len(output):
+                    output.append(dict())
+                elif not k.isdigit():
+                    output[k] = dict()
+                if isinstance(output, dict):
+                    legacy_create_nested_dict(v, output[k], master_key_name)
+                elif isinstance(output, list):
+                    legacy_create_nested_dict(v, output[int(k)], master_key_name)
+            else:
+                legacy_create_nested_dict(v, output[k], master_key_name)
+        else:
+            if isinstance(v, list):
+                element = [e['displayValue'] for e in v]
+            else:
+                element = v
+            output[k] = element
+
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fields', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = dash.Dash(__name__)
+    start = time.perf_counter()
+    schema = make_schema(breadth=max(1, args.fields // FORM_FIELDS), depth=0, fields=FIELDS, array_items=ARRAY_ITEMS)
+    container = SchemaFormContainer(id='bench', schema=schema, parent_app=app)
+    print(f'built container with {len(container.data)} fields in {time.perf_counter() - start:.2f}s')
+    for i, v in enumerate(container.data.values()):
+        value = field_value(v['compound_id']['data_type'], i)
+        if v['compound_id']['data_type'] == 'tags':
+            # As sent by TagInput, the only tags format the legacy version reads
+            value = [{'index': j, 'displayValue': e} for j, e in enumerate(value)]
+        v['value'] = value
+
+    legacy_time, (_, legacy) = timeit(lambda: legacy_data_to_nested(container.data, container.root_path), args.repeat)
+    nested_time, (_, nested) = timeit(container.data_to_nested, args.repeat)
+    assert legacy == nested
+
+    print(f'legacy split/merge:  {legacy_time * 1000:.1f}ms')
+    print(f'path single pass:    {nested_time * 1000:.1f}ms')
+    print(f'speedup:             {legacy_time / nested_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
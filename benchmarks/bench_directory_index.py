@@ -0,0 +1,105 @@
+"""
+Benchmark the directory scan used by the file browser on a synthetic tree.
+
+Compares the previous os.walk based make_dict_from_dir implementation with
+the scandir engine in DirectoryIndex.
+
+    python benchmarks/bench_directory_index.py --files 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from json_schema_to_dash_forms.directory_index import DirectoryIndex
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import timeit  # noqa: E402
+from schema_generator import make_tree  # noqa: E402
+
+
+def legacy_make_dict_from_dir(root_dir, display=None):
+    """make_dict_from_dir as implemented before the scandir engine"""
+    keys_list = []
+    paths_list = []
+    for path, dirs, files in os.walk(root_dir):
+        curr_path = path + '/'
+
+        if curr_path.startswith('/'):
+            curr_path = curr_path[1:]
+        if curr_path not in paths_list:
+            paths_list.append(curr_path)
+        if len(files) > 0 and display != 'directory':
+            for file in files:
+                aux_dict = {}
+                file_path = Path(path) / file
+
+                mod_datetime = datetime.fromtimestamp(os.path.getmtime(file_path))
+                delta = datetime.utcnow() - mod_datetime
+                size = os.path.getsize(file_path)
+
+                aux_dict['key'] = str(file_path).replace("\\", "/")
+                aux_dict['modified'] = delta.days
+                aux_dict['size'] = size
+
+                keys_list.append(aux_dict)
+
+    for path in paths_list:
+        aux_dict = dict()
+        aux_dict['key'] = str(path).replace("\\", '/')
+        aux_dict['modified'] = None
+        aux_dict['size'] = 0
+        keys_list.append(aux_dict)
+
+    splitter = Path(root_dir).parent.name
+    if str(Path(root_dir).parent) == '.':
+        splitter = '.'
+
+    if splitter:
+        for e in keys_list:
+            splits = e['key'].split(splitter, maxsplit=1)
+            if len(splits) > 1:
+                splitted = splits[1]
+            else:
+                splitted = splits[0]
+            if splitted.startswith('/'):
+                splitted = splitted[1:]
+                e['key'] = splitted
+            elif splitted.startswith('.'):
+                splitted = splitted[2:]
+                e['key'] = splitted
+    return keys_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--root', default=None, help='Existing directory to scan instead of a synthetic tree')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.root is None:
+            root = os.path.join(tmp, 'data')
+            start = time.perf_counter()
+            make_tree(root, args.files)
+            print(f'created {args.files} files in {time.perf_counter() - start:.2f}s')
+        else:
+            root = args.root
+
+        legacy_time, legacy = timeit(lambda: legacy_make_dict_from_dir(root), args.repeat)
+        index = DirectoryIndex(root)
+        scan_time, entries = timeit(lambda: index.refresh(force=True) and index.entries(), args.repeat)
+        check_time, _ = timeit(index.refresh, args.repeat)
+
+    print(f'legacy os.walk:      {legacy_time:.3f}s ({len(legacy)} entries)')
+    print(f'scandir index:       {scan_time:.3f}s ({len(entries)} entries)')
+    print(f'unchanged refresh:   {check_time:.3f}s')
+    print(f'speedup:             {legacy_time / scan_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
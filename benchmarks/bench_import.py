@@ -0,0 +1,59 @@
+"""
+Benchmark the import time of the data core and of the Dash components.
+
+Each import runs in a fresh interpreter. The script fails if importing the
+data core loads Dash, its component libraries or NumPy.
+
+    python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import subprocess
+import sys
+
+CORE = (
+    'import json_schema_to_dash_forms;'
+    'import json_schema_to_dash_forms.schema_plan, json_schema_to_dash_forms.form_data,'
+    ' json_schema_to_dash_forms.prefill, json_schema_to_dash_forms.export, json_schema_to_dash_forms.validation'
+)
+FULL = 'from json_schema_to_dash_forms import SchemaFormContainer'
+HEAVY = ('dash', 'dash_bootstrap_components', 'dash_core_components', 'dash_html_components',
+         'dash_cool_components', 'numpy')
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def time_import(statement):
+    """Seconds taken by statement in a fresh interpreter, and the heavy modules it loaded"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY)],
+        check=True, capture_output=True, text=True
+    )
+    elapsed, _, loaded = result.stdout.strip().partition(' ')
+    return float(elapsed), [m for m in loaded.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for name, statement in (('data core', CORE), ('dash components', FULL)):
+        runs = [time_import(statement) for _ in range(args.repeat)]
+        results[name] = min(elapsed for elapsed, _ in runs), runs[0][1]
+
+    for name, (elapsed, loaded) in results.items():
+        print(f'{name + ":":18} {elapsed * 1000:7.1f}ms  loads {", ".join(loaded) or "none of " + ", ".join(HEAVY)}')
+
+    if results['data core'][1]:
+        sys.exit(f'data core imports {", ".join(results["data core"][1])}')
+
+
+if __name__ == '__main__':
+    main()
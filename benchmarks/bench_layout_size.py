@@ -0,0 +1,71 @@
+"""
+Compare the layout of the default and compact rendering modes: serialized
+bytes, number of components and build time.
+
+    python benchmarks/bench_layout_size.py --breadth 20 --fields 100
+    python benchmarks/bench_layout_size.py path/to/schema.json --root-path path/to/data
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import dash
+
+from json_schema_to_dash_forms import SchemaFormContainer
+from json_schema_to_dash_forms.profiling import serialized_size
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from schema_generator import make_schema  # noqa: E402
+
+
+def measure(schema, root_path, compact, repeat=3):
+    seconds = float('inf')
+    for _ in range(repeat):
+        app = dash.Dash(__name__)
+        start = time.perf_counter()
+        container = SchemaFormContainer(id='layout', schema=schema, parent_app=app, root_path=root_path, compact=compact)
+        seconds = min(seconds, time.perf_counter() - start)
+    forms = container.children_forms
+    return {
+        'fields': len(container.data),
+        'build_seconds': seconds,
+        'forms_bytes': serialized_size(forms),
+        'layout_bytes': serialized_size(container),
+        'forms_components': sum(1 + sum(1 for _ in form._traverse()) for form in forms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('schema', nargs='?', default=None, help='Schema file, a synthetic schema if not given')
+    parser.add_argument('--root-path', default=None, help='DATA_PATH of the file browsers, an empty directory if not given')
+    parser.add_argument('--breadth', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--fields', type=int, default=30)
+    parser.add_argument('--array-items', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.schema is not None:
+        with open(args.schema) as f:
+            schema = json.load(f)
+    else:
+        schema = make_schema(breadth=args.breadth, depth=args.depth, fields=args.fields, array_items=args.array_items)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root_path = args.root_path or tmp
+        default = measure(schema, root_path, compact=False)
+        compact = measure(schema, root_path, compact=True)
+
+    print(f"{default['fields']} fields")
+    print(f"{'':22} {'default':>12} {'compact':>12} {'ratio':>7}")
+    for key in ('forms_bytes', 'layout_bytes', 'forms_components', 'build_seconds'):
+        print(f"{key:22} {default[key]:12.6g} {compact[key]:12.6g} {compact[key] / default[key]:7.2f}")
+    print(f"{'bytes per field':22} {default['forms_bytes'] / default['fields']:12.0f} "
+          f"{compact['forms_bytes'] / compact['fields']:12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Benchmark suite on a synthetic schema, see schema_generator.make_schema.
+
+Measures container construction, serialized layout size, the latency and
+payload size of the forms callbacks run through the Flask test client,
+data_to_nested, update_data and the file browser directory listing. Results
+are saved as JSON, and compared with a previous results file if given.
+
+    python benchmarks/bench_suite.py --breadth 20 --depth 2 --array-items 5 --links 2 --paths 2
+    python benchmarks/bench_suite.py --output new.json --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import dash
+import plotly
+
+from json_schema_to_dash_forms import SchemaFormContainer
+from json_schema_to_dash_forms.schema_plan import plan_cache
+from json_schema_to_dash_forms.state_store import SESSION_COOKIE
+from json_schema_to_dash_forms.utils import FileBrowserComponent
+from json_schema_to_dash_forms.validation import validator_cache
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import timeit  # noqa: E402
+from schema_generator import make_schema, make_tree, field_value  # noqa: E402
+
+CONTAINER_ID = 'bench'
+
+# Outputs of update_forms_values, in the order of the callback
+VALUES_OUTPUTS = [
+    ('path', 'value'), ('boolean', 'checked'), ('string', 'value'), ('datetime', 'defaultValue'),
+    ('tags', 'injectedTags'), ('name', 'value'), ('number', 'value')
+]
+
+
+def metadata_input(data_type, index):
+    return {'type': 'metadata-input', 'container_id': CONTAINER_ID, 'data_type': data_type, 'index': index}
+
+
+def prop_id(component_id, prop):
+    if isinstance(component_id, dict):
+        component_id = json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+    return f'{component_id}.{prop}'
+
+
+def layout_fields(layout):
+    """Field ids by data type, in layout order, as the browser would send them for ALL wildcards"""
+    fields = {}
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            if 'props' in node:
+                component_id = node['props'].get('id')
+                if isinstance(component_id, dict) and component_id.get('type') == 'metadata-input':
+                    fields.setdefault(component_id['data_type'], []).append(component_id['index'])
+                stack.append(node['props'].get('children'))
+        elif hasattr(node, 'to_plotly_json'):
+            stack.append(node.to_plotly_json())
+    return fields
+
+
+class CallbackClient:
+    """Runs callbacks of an app through the Flask test client, in a single session"""
+
+    def __init__(self, app):
+        self.app = app
+        self.client = app.server.test_client()
+        self.session_id = None
+
+    def output_key(self, needle):
+        return next(k for k in self.app.callback_map if needle in k)
+
+    def call(self, needle, inputs, state=(), changed=(), outputs=None):
+        payload = json.dumps({
+            'output': self.output_key(needle),
+            'outputs': outputs,
+            'inputs': inputs,
+            'state': list(state),
+            'changedPropIds': list(changed)
+        })
+        response = self.client.post('/_dash-update-component', data=payload, content_type='application/json')
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f'{needle}: {response.status_code} {response.get_data(as_text=True)[:500]}')
+        for header in response.headers.getlist('Set-Cookie'):
+            if header.startswith(SESSION_COOKIE + '='):
+                self.session_id = header.split(';')[0].split('=', 1)[1]
+        return len(payload), len(response.get_data())
+
+    @contextmanager
+    def session(self):
+        """Request context of the client's session, to change its state from the benchmark"""
+        server = self.app.server
+        with server.test_request_context(headers={'Cookie': f'{SESSION_COOKIE}={self.session_id}'}):
+            server.preprocess_request()
+            yield
+            server.process_response(server.response_class())
+
+
+def bench_callbacks(app, container, fields, repeat):
+    """Latency and payload bytes of update_internal_dict, update_forms_values and update_forms_links"""
+    client = CallbackClient(app)
+    results = {}
+    values = {
+        index: field_value(data_type, i)
+        for data_type, indexes in fields.items()
+        for i, index in enumerate(indexes)
+        if data_type not in ('path', 'link')
+    }
+    edited = next(iter(values), None)
+
+    # update_internal_dict, the values of all fields with one of them changed by the user
+    counter = iter(range(10 ** 9))
+
+    def internal_dict():
+        if edited is not None:
+            values[edited] = f'edit {next(counter)}' if isinstance(values[edited], str) else values[edited]
+        return client.call(
+            'output-update-finished-verification',
+            inputs=[{'id': f'{CONTAINER_ID}-external-trigger-update-internal-dict', 'property': 'children', 'value': 1}],
+            state=[{'id': f'{CONTAINER_ID}-values-store', 'property': 'data', 'value': values}],
+            changed=[f'{CONTAINER_ID}-external-trigger-update-internal-dict.children']
+        )
+
+    internal_dict()
+    results['update_internal_dict'] = _callback_result(*timeit(internal_dict, repeat))
+
+    # update_forms_values, after a server side change of one field and of all fields
+    trigger = {'type': 'external-trigger-update-forms-values', 'index': f'{CONTAINER_ID}-external-trigger-update-forms-values'}
+    outputs = [
+        [{'id': metadata_input(data_type, index), 'property': prop} for index in fields.get(data_type, [])]
+        for data_type, prop in VALUES_OUTPUTS
+    ]
+    outputs.append({'id': f'{CONTAINER_ID}-trigger-update-links-values', 'property': 'children'})
+
+    def forms_values():
+        return client.call(
+            'trigger-update-links-values.children',
+            inputs=[[{'id': trigger, 'property': 'children', 'value': 1}], []],
+            changed=[prop_id(trigger, 'children')],
+            outputs=outputs
+        )
+
+    def mark_dirty(indexes):
+        with client.session():
+            container.mark_dirty(indexes)
+
+    if edited is not None:
+        results['update_forms_values_one_changed'] = _callback_result(
+            *timeit(forms_values, repeat, setup=lambda: mark_dirty([edited]))
+        )
+    results['update_forms_values_all_changed'] = _callback_result(
+        *timeit(forms_values, repeat, setup=lambda: mark_dirty(None))
+    )
+
+    # update_forms_links, refreshing the options of all link fields
+    links_trigger = {'type': 'external-trigger-update-links-values', 'index': f'{CONTAINER_ID}-external-trigger-update-links-values'}
+    names = fields.get('name', [])
+    links = fields.get('link', [])
+
+    def forms_links():
+        return client.call(
+            'output-placeholder-links-values',
+            inputs=[
+                {'id': f'{CONTAINER_ID}-trigger-update-links-values', 'property': 'children', 'value': None},
+                [{'id': links_trigger, 'property': 'children', 'value': 1}]
+            ],
+            state=[[{'id': metadata_input('name', k), 'property': 'value', 'value': f'name {i}'} for i, k in enumerate(names)]],
+            changed=[prop_id(links_trigger, 'children')],
+            outputs=[
+                [{'id': metadata_input('link', k), 'property': 'options'} for k in links],
+                [{'id': metadata_input('link', k), 'property': 'value'} for k in links],
+                {'id': f'{CONTAINER_ID}-output-placeholder-links-values', 'property': 'children'}
+            ]
+        )
+
+    results['update_forms_links'] = _callback_result(*timeit(forms_links, repeat))
+    return results
+
+
+def _callback_result(seconds, sizes):
+    request_bytes, response_bytes = sizes
+    return {'seconds': seconds, 'request_bytes': request_bytes, 'response_bytes': response_bytes}
+
+
+def bench_directory(root, n_files, repeat):
+    """make_dict_from_dir on the generated tree, with a fresh scan and with the index current"""
+    app = dash.Dash(__name__)
+    browser = FileBrowserComponent(parent_app=app, container_id=CONTAINER_ID, index='bench', root_dir=root)
+
+    def scan():
+        browser.index.refresh(force=True)
+        browser.make_dict_from_dir(None)
+
+    cold, _ = timeit(scan, repeat)
+    warm, _ = timeit(lambda: browser.make_dict_from_dir(None), repeat)
+    return {'files': n_files, 'entries': len(browser.paths_tree), 'scan_seconds': cold, 'cached_seconds': warm}
+
+
+def run(args, root):
+    """Run all benchmarks, with root as the DATA_PATH of the file browsers"""
+    schema = make_schema(
+        breadth=args.breadth, depth=args.depth, subforms=args.subforms, fields=args.fields,
+        refs=args.refs, array_items=args.array_items, links=args.links, paths=args.paths
+    )
+    results = {}
+
+    def build():
+        app = dash.Dash(__name__)
+        container = SchemaFormContainer(id=CONTAINER_ID, schema=schema, parent_app=app, root_path=root)
+        app.layout = container
+        return app, container
+
+    def clear_caches():
+        plan_cache.clear()
+        validator_cache.clear()
+
+    results['construction_seconds'], _ = timeit(build, args.repeat, setup=clear_caches)
+    results['construction_cached_plan_seconds'], (app, container) = timeit(build, args.repeat)
+
+    layout = json.dumps(container, cls=plotly.utils.PlotlyJSONEncoder)
+    fields = layout_fields(json.loads(layout))
+    results['fields'] = len(container.data)
+    results['layout_bytes'] = len(layout)
+
+    results['callbacks'] = bench_callbacks(app, container, fields, args.repeat)
+
+    for i, (index, entry) in enumerate(container.data.items()):
+        entry['value'] = field_value(entry['compound_id']['data_type'], i)
+    container.mark_dirty()
+    results['data_to_nested_seconds'], (_, nested) = timeit(container.data_to_nested, args.repeat)
+    results['update_data_seconds'], _ = timeit(lambda: container.update_data(nested), args.repeat)
+
+    if args.files:
+        results['make_dict_from_dir'] = bench_directory(root, args.files, args.repeat)
+    return results
+
+
+def flatten(results, prefix=''):
+    """Numeric results keyed by dotted names"""
+    flat = {}
+    for k, v in results.items():
+        if isinstance(v, dict):
+            flat.update(flatten(v, prefix=f'{prefix}{k}.'))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            flat[prefix + k] = v
+    return flat
+
+
+def compare(current, previous):
+    """Print each metric with its ratio to the previous results"""
+    before = flatten(previous['results'])
+    for name, value in flatten(current['results']).items():
+        ratio = f'{value / before[name]:6.2f}x' if before.get(name) else '      -'
+        print(f'{name:50} {value:14.6g} {ratio}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--breadth', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--subforms', type=int, default=2)
+    parser.add_argument('--fields', type=int, default=10)
+    parser.add_argument('--refs', action='store_true')
+    parser.add_argument('--array-items', type=int, default=3)
+    parser.add_argument('--links', type=int, default=1)
+    parser.add_argument('--paths', type=int, default=1)
+    parser.add_argument('--files', type=int, default=10000, help='Files of the directory tree, 0 to skip')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help='Previous results file')
+    args = parser.parse_args()
+
+    report = {
+        'params': vars(args),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dash': dash.__version__,
+            'date': datetime.now().isoformat(timespec='seconds')
+        }
+    }
+    # Path fields embed the tree of DATA_PATH, so it is generated for reproducible layouts
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'data')
+        os.makedirs(root)
+        make_tree(root, args.files)
+        report['results'] = run(args, root)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    else:
+        for name, value in flatten(report['results']).items():
+            print(f'{name:50} {value:14.6g}')
+    print(f'saved {args.output}')
+
+
+if __name__ == '__main__':
+    main()
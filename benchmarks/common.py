@@ -0,0 +1,17 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import time
+
+
+def timeit(func, repeat, setup=None):
+    """Best time of repeat calls of func, running setup before each one, and the result of the last call"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
@@ -0,0 +1,65 @@
+"""
+Profile the construction of a container: time and serialized size per
+subform and per field data type. With --memory the tracemalloc peak is
+measured in a second build, so the timings are not slowed by tracing.
+
+    python benchmarks/profile_construction.py path/to/schema.json --root-path path/to/data
+    python benchmarks/profile_construction.py --breadth 20 --depth 2 --paths 2 --json profile.json
+"""
+import argparse
+import json
+import os
+import sys
+
+import dash
+
+from json_schema_to_dash_forms import SchemaFormContainer
+from json_schema_to_dash_forms.profiling import format_report
+from json_schema_to_dash_forms.schema_plan import plan_cache
+from json_schema_to_dash_forms.validation import validator_cache
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from schema_generator import make_schema  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('schema', nargs='?', default=None, help='Schema file, a synthetic schema if not given')
+    parser.add_argument('--root-path', default=None, help='DATA_PATH of the file browsers')
+    parser.add_argument('--breadth', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--fields', type=int, default=10)
+    parser.add_argument('--array-items', type=int, default=3)
+    parser.add_argument('--links', type=int, default=1)
+    parser.add_argument('--paths', type=int, default=1)
+    parser.add_argument('--memory', action='store_true', help='Also measure the tracemalloc peak, in a second build')
+    parser.add_argument('--json', default=None, help='Also save the report as JSON')
+    args = parser.parse_args()
+
+    if args.schema is not None:
+        with open(args.schema) as f:
+            schema = json.load(f)
+    else:
+        schema = make_schema(
+            breadth=args.breadth, depth=args.depth, fields=args.fields,
+            array_items=args.array_items, links=args.links, paths=args.paths
+        )
+
+    def build(profile):
+        plan_cache.clear()
+        validator_cache.clear()
+        app = dash.Dash(__name__)
+        container = SchemaFormContainer(id='profile', schema=schema, parent_app=app, root_path=args.root_path, profile=profile)
+        return container.construction_profile
+
+    report = build(profile=True)
+    if args.memory:
+        report['tracemalloc_peak_bytes'] = build(profile='memory')['tracemalloc_peak_bytes']
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic schemas and directory trees for the benchmarks.
+"""
+import os
+
+FIELD_TYPES = (
+    {'type': 'string'},
+    {'type': 'number', 'minimum': 0},
+    {'type': 'boolean'},
+    {'type': 'string', 'enum': ['A', 'B', 'C']},
+    {'type': 'array', 'items': {'type': 'string'}},
+    {'type': 'string', 'format': 'date-time'},
+    {'type': 'string', 'pattern': '^[a-z0-9 ]*$'},
+)
+
+
+def make_schema(breadth=10, depth=1, subforms=2, fields=10, refs=False, array_items=0, links=0, paths=0):
+    """
+    Schema with breadth root forms of the same shape.
+
+    Args:
+        breadth [int]: number of root forms
+        depth [int]: levels of nested subforms under each root form
+        subforms [int]: nested subforms of each (sub)form above the last level
+        fields [int]: fields of each (sub)form, cycling through FIELD_TYPES
+        refs [bool]: define nested subforms and array entries once in definitions
+            and use them through $ref, instead of repeating them inline
+        array_items [int]: minItems of an array of subforms in each root form, 0 for none
+        links [int]: link fields of each root form, pointing to the next root forms
+        paths [int]: path fields of each root form, alternating files and directories
+    Returns:
+        schema [dict]
+    """
+    definitions = {}
+
+    def level_schema(level):
+        schema = {
+            'type': 'object',
+            'tag': f'bench.Level{level}',
+            'required': ['field_0'] if fields else [],
+            'properties': {f'field_{i}': dict(FIELD_TYPES[i % len(FIELD_TYPES)]) for i in range(fields)}
+        }
+        if level < depth:
+            for k in range(subforms):
+                schema['properties'][f'sub_{k}'] = level_ref(level + 1)
+        return schema
+
+    def level_ref(level):
+        if not refs:
+            return level_schema(level)
+        name = f'Level{level}'
+        if name not in definitions:
+            definitions[name] = level_schema(level)
+        return {'$ref': f'#/definitions/{name}'}
+
+    def entry_ref():
+        entry = {
+            'type': 'object',
+            'tag': 'bench.Entry',
+            'properties': dict(
+                {'name': {'type': 'string'}},
+                **{f'field_{i}': dict(FIELD_TYPES[i % len(FIELD_TYPES)]) for i in range(max(1, fields // 2))}
+            )
+        }
+        if not refs:
+            return entry
+        definitions['Entry'] = entry
+        return {'$ref': '#/definitions/Entry'}
+
+    properties = {}
+    for f in range(breadth):
+        form = {
+            'type': 'object',
+            'tag': f'bench.Form{f}',
+            'required': ['name'],
+            'properties': {'name': {'type': 'string'}}
+        }
+        form['properties'].update(level_schema(0)['properties'])
+        for j in range(links):
+            form['properties'][f'link_{j}'] = {'type': 'string', 'target': f'bench.Form{(f + 1 + j) % breadth}'}
+        for j in range(paths):
+            form['properties'][f'path_{j}'] = {'type': 'string', 'format': 'file' if j % 2 == 0 else 'directory'}
+        if array_items:
+            form['properties']['entries'] = {'type': 'array', 'minItems': array_items, 'items': entry_ref()}
+        properties[f'form_{f}'] = form
+
+    schema = {'type': 'object', 'properties': properties}
+    if definitions:
+        schema['definitions'] = definitions
+    return schema
+
+
+def field_value(data_type, i):
+    """Value of the i-th field of a data type, as stored in container data"""
+    return {
+        'string': f'value {i}',
+        'name': f'name{i}',
+        'number': i,
+        'boolean': i % 2 == 0,
+        'choicestring': 'A',
+        'tags': ['a', 'b'],
+        'datetime': '2020-01-01T00:00:00',
+        'path': None,
+        'link': None,
+    }[data_type]
+
+
+def make_tree(root, n_files, files_per_dir=100, dirs_per_level=10):
+    """Create n_files empty files spread over a balanced directory tree"""
+    n_dirs = max(1, n_files // files_per_dir)
+    created = 0
+    for d in range(n_dirs):
+        parts = []
+        i = d
+        while True:
+            parts.append(f'd{i % dirs_per_level}')
+            i //= dirs_per_level
+            if i == 0:
+                break
+        dir_path = os.path.join(root, *parts, f'leaf{d}')
+        os.makedirs(dir_path, exist_ok=True)
+        for f in range(min(files_per_dir, n_files - created)):
+            open(os.path.join(dir_path, f'file{f}.dat'), 'w').close()
+            created += 1
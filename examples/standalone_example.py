@@ -4,8 +4,7 @@ import dash_html_components as html
 import json
 from pathlib import Path
 from json_schema_to_dash_forms import SchemaFormContainer
-from dash.dependencies import Input, Output, State
-import numpy as np
+from dash.dependencies import Input, Output
 import json
 
 
@@ -70,42 +69,25 @@ app.layout = dbc.Container([
 
 
 @app.callback(
-    Output('myform-external-trigger-update-internal-dict', 'children'),
-    Input('show_data', 'n_clicks')
-)
-def update_internal_form_dict(click):
-    """
-    This function trigger myform internal dict update.
-    When the update is done it will return a flag on
-    "myform-output-update-finished-verification".
-    """
-    ctx = dash.callback_context
-
-    if not ctx.triggered:
-        return dash.no_update
-
-    return str(np.random.rand())
-
-@app.callback(
-    [         
+    [
         Output('alerts', 'is_open'),
         Output('alerts', 'children'),
         Output('display_results', 'value')
     ],
-    [Input('myform-output-update-finished-verification', 'children')],
-    [State('alerts', 'is_open')]
+    [Input('show_data', 'n_clicks')],
+    my_form.submit_states()
 )
-def show_data_from_internal_dict(trigger, is_open):
+def show_data(click, *form_states):
     """
-    This functions runs when the update internal dict is done
-    It will read myform internal dict and create an output nested dict
-    with the forms data, following the rules defined by the schema.
+    This function reads the form values sent with the click, in a single request,
+    and creates an output nested dict with the forms data, following the rules
+    defined by the schema.
     """
 
-    if not trigger:
+    if not click:
         return dash.no_update
 
-    alerts, output = my_form.data_to_nested() # Read internal dict and get missing required fields and output nested dict
+    alerts, output = my_form.states_to_nested(*form_states) # Get missing required fields and output nested dict
 
     if alerts is not None:
         return True, alerts, '' # If any missing fields return alerts
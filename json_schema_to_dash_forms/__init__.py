@@ -1 +1,33 @@
-from .forms import SchemaFormContainer
+"""
+The Dash components (SchemaFormContainer) are imported on first use, so the
+data core, e.g. schema_plan, form_data, prefill, export, validation and
+cache, can be imported without Dash or its component libraries.
+"""
+import importlib
+
+_exports = {
+    'SchemaFormContainer': 'forms',
+    'StateStore': 'state_store',
+    'MemoryStateStore': 'state_store',
+    'SQLiteStateStore': 'state_store',
+    'compile_schema': 'schema_plan',
+    'FormData': 'form_data',
+    'new_state': 'form_data',
+    'PrefillReport': 'prefill',
+    'ValidationError': 'validation',
+    'build_nested': 'export',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_exports[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
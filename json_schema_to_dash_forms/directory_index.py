@@ -0,0 +1,447 @@
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from .cache import LRUCache
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+class DirectoryIndex:
+    """
+    Process-wide listing of all files and directories under a root path.
+
+    A single scan is shared by every file browser pointing at the same root.
+    The listing is considered stale when the modification time of any scanned
+    directory changes or, if a ttl is given, once it is older than ttl seconds.
+    Concurrent refreshes are coalesced: callers that wait on a scan already
+    in progress reuse its result instead of walking the tree again.
+
+    When a DirectoryWatcher is running the index is kept current in place and
+    every change is recorded, so clients can ask for the entries added and
+    removed since the generation they last saw with changes_since().
+    """
+
+    def __init__(self, root_dir, ttl=None, max_changes=1000, max_listings=256):
+        self.root_dir = str(root_dir)
+        self.ttl = ttl
+        self.generation = 0
+        self.watcher = None
+        self._lock = threading.RLock()
+        self._scanned_at = None
+        self._base_generation = 0
+        self._changes = deque(maxlen=max_changes)
+        self._dir_mtimes = {}
+        self._dir_keys = {}
+        self._children = {}
+        self._files = {}
+        self._dirs = {}
+        self._listings = LRUCache(maxsize=max_listings)
+
+    def entries(self, display=None):
+        """
+        Return the KeyedFileBrowser entries for this root, rescanning only if stale.
+
+        Args:
+            display [str | None]: 'directory' to list only directories
+        """
+        return self.snapshot(display=display)[1]
+
+    def snapshot(self, display=None):
+        """
+        Like entries, with the generation they belong to, read under the
+        index lock so that no watcher update falls between the two.
+
+        Returns:
+            tuple (generation [int], entries [list])
+        """
+        self.refresh()
+        with self._lock:
+            if display == 'directory':
+                return self.generation, list(self._dirs.values())
+            return self.generation, list(self._files.values()) + list(self._dirs.values())
+
+    def top_level(self, display=None):
+        """Return the entry for root_dir itself plus its direct children"""
+        prefix = self._prefix()
+        root = [{'key': prefix, 'modified': None, 'size': 0}] if prefix else []
+        return root + self.list_dir(prefix, display=display)
+
+    def list_dir(self, key, display=None):
+        """
+        Return the entries directly under one directory, without walking the tree.
+
+        Listings of the max_listings directories used last are cached and
+        reused until their mtime changes. As in the full scan, symlinked
+        directories are listed as entries but never expanded.
+
+        Args:
+            key [str]: directory key as used in the browser, e.g. 'data/sub/'
+            display [str | None]: 'directory' to list only directories
+        """
+        path = self._key_to_path(key)
+        if self._through_symlink(path):
+            return []
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return []
+        cached = self._listings.get(path)
+        if cached is None or cached[0] != mtime:
+            files_list, dirs_list = self._list_dir(path, key)
+            cached = (mtime, files_list, dirs_list)
+            self._listings.put(path, cached)
+        if display == 'directory':
+            return list(cached[2])
+        return cached[1] + cached[2]
+
+    def changes_since(self, generation, display=None):
+        """
+        Return the entries added and the keys removed since a given generation.
+
+        Modified entries are reported both as removed and as added. The
+        changes and the generation they lead to are read together under the
+        index lock, so clients never skip an update applied in between.
+
+        Returns:
+            None if the changes are no longer available and the client must
+            reload all entries, else a tuple (generation [int], added [list], removed [list])
+        """
+        with self._lock:
+            current = self.generation
+            if generation == current:
+                return current, [], []
+            if generation < self._base_generation or generation > current:
+                return None
+            if not self._changes or self._changes[0][0] > generation + 1:
+                return None
+            added = {}
+            removed = set()
+            for change_generation, change_added, change_removed in self._changes:
+                if change_generation <= generation:
+                    continue
+                for k in change_removed:
+                    added.pop(k, None)
+                    removed.add(k)
+                for e in change_added:
+                    added[e['key']] = e
+        added = list(added.values())
+        removed = sorted(removed)
+        if display == 'directory':
+            added = [e for e in added if e['key'].endswith('/')]
+            removed = [k for k in removed if k.endswith('/')]
+        return current, added, removed
+
+    def refresh(self, force=False):
+        """Rescan the tree if it is stale (or if force), coalescing concurrent calls"""
+        generation = self.generation
+        if not force and not self.is_stale():
+            return False
+        with self._lock:
+            # Another thread finished a scan while we waited for the lock
+            if self.generation != generation and not self.is_stale():
+                return False
+            self._scan()
+            self.generation += 1
+            self._base_generation = self.generation
+            self._changes.clear()
+        return True
+
+    def invalidate(self):
+        """Force the next call to entries() to rescan the tree"""
+        self._scanned_at = None
+
+    def is_stale(self):
+        if self._scanned_at is None:
+            return True
+        if self.watcher is not None and self.watcher.is_alive():
+            return False
+        if self.ttl is not None:
+            return time.monotonic() - self._scanned_at > self.ttl
+        return len(self.changed_dirs()) > 0
+
+    def changed_dirs(self):
+        """Return the scanned directories whose mtime changed since they were read"""
+        changed = []
+        for path, mtime in list(self._dir_mtimes.items()):
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    changed.append(path)
+            except OSError:
+                changed.append(path)
+        return changed
+
+    def start_watcher(self, interval=2.0):
+        """Start (once) a background thread that keeps this index current"""
+        with self._lock:
+            if self.watcher is None or not self.watcher.is_alive():
+                self.refresh()
+                self.watcher = DirectoryWatcher(index=self, interval=interval)
+                self.watcher.start()
+            return self.watcher
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def apply_dir_changes(self, paths):
+        """
+        Re-read only the given directories and record the entries added and removed.
+
+        Returns:
+            tuple (added [list], removed [list]) for this update
+        """
+        added = []
+        removed = []
+        with self._lock:
+            if self._scanned_at is None:
+                self.refresh()
+                return added, removed
+            for path in paths:
+                key = self._dir_keys.get(path)
+                if key is None:
+                    continue
+                try:
+                    mtime = os.stat(path).st_mtime
+                    files_list, dirs_list = self._list_dir(path, key)
+                except OSError:
+                    # Directory is gone, the update of its parent removes it
+                    continue
+                self._dir_mtimes[path] = mtime
+                current = {e['key']: e for e in files_list + dirs_list}
+                previous = self._children.get(key, set())
+                for k in previous - current.keys():
+                    removed.extend(self._remove_entry(k))
+                for k, e in current.items():
+                    if k not in previous:
+                        added.extend(self._add_entry(e, os.path.join(path, k[len(key):])))
+                    elif not k.endswith('/') and self._files.get(k) != e:
+                        self._files[k] = e
+                        removed.append(k)
+                        added.append(e)
+                self._children[key] = set(current)
+            if added or removed:
+                self.generation += 1
+                self._changes.append((self.generation, added, removed))
+        return added, removed
+
+    def _add_entry(self, entry, path):
+        key = entry['key']
+        if not key.endswith('/'):
+            self._files[key] = entry
+            return [entry]
+        self._dirs[key] = entry
+        path = path.rstrip('/')
+        if os.path.islink(path):
+            return [entry]
+        files = {}
+        dirs = {}
+        self._walk(path, key, files, dirs)
+        self._files.update(files)
+        self._dirs.update(dirs)
+        return [entry] + list(files.values()) + list(dirs.values())
+
+    def _remove_entry(self, key):
+        if not key.endswith('/'):
+            return [key] if self._files.pop(key, None) is not None else []
+        removed = []
+        for child in self._children.pop(key, set()):
+            removed.extend(self._remove_entry(child))
+        if self._dirs.pop(key, None) is not None:
+            removed.append(key)
+        path = self._key_to_path(key)
+        self._dir_keys.pop(path, None)
+        self._dir_mtimes.pop(path, None)
+        return removed
+
+    def _prefix(self):
+        # Keys are relative to the parent of root_dir, e.g. 'data/sub/file.txt'
+        prefix = Path(self.root_dir).name
+        if prefix:
+            prefix += '/'
+        return prefix
+
+    def _key_to_path(self, key):
+        prefix = self._prefix()
+        relative = os.path.normpath(key[len(prefix):] or '.')
+        if not key.startswith(prefix) or relative.startswith('..') or os.path.isabs(relative):
+            raise ValueError(f"'{key}' is not inside {self.root_dir}")
+        return os.path.normpath(os.path.join(self.root_dir, relative))
+
+    def _through_symlink(self, path):
+        # Whether path or one of its parents under root_dir is a symlink
+        relative = os.path.relpath(path, self.root_dir)
+        path = self.root_dir
+        for part in Path(relative).parts:
+            path = os.path.join(path, part)
+            if os.path.islink(path):
+                return True
+        return False
+
+    def _list_dir(self, path, key):
+        now = time.time()
+        files_list = []
+        dirs_list = []
+        with os.scandir(path) as scanner:
+            for entry in scanner:
+                try:
+                    if entry.is_dir():
+                        dirs_list.append({'key': key + entry.name + '/', 'modified': None, 'size': 0})
+                    else:
+                        stat = entry.stat()
+                        files_list.append({
+                            'key': key + entry.name,
+                            'modified': int((now - stat.st_mtime) // 86400),
+                            'size': stat.st_size
+                        })
+                except OSError:
+                    continue
+        return files_list, dirs_list
+
+    def _walk(self, root, root_key, files, dirs):
+        """Single-pass scandir walk of root, filling the files and dirs mappings"""
+        now = time.time()
+        stack = [(os.path.normpath(root), root_key)]
+        while stack:
+            path, key = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime
+                scanner = os.scandir(path)
+            except OSError:
+                continue
+            self._dir_mtimes[path] = mtime
+            self._dir_keys[path] = key
+            children = set()
+            with scanner:
+                for entry in scanner:
+                    try:
+                        is_dir = entry.is_dir()
+                        if is_dir:
+                            entry_key = key + entry.name + '/'
+                        else:
+                            entry_key = key + entry.name
+                        if entry_key in children:
+                            continue
+                        children.add(entry_key)
+                        if is_dir:
+                            dirs[entry_key] = {'key': entry_key, 'modified': None, 'size': 0}
+                            if not entry.is_symlink():
+                                stack.append((entry.path, entry_key))
+                        else:
+                            stat = entry.stat()
+                            files[entry_key] = {
+                                'key': entry_key,
+                                'modified': int((now - stat.st_mtime) // 86400),
+                                'size': stat.st_size
+                            }
+                    except OSError:
+                        continue
+            self._children[key] = children
+
+    def _scan(self):
+        prefix = self._prefix()
+        files = {}
+        dirs = {}
+        if prefix:
+            dirs[prefix] = {'key': prefix, 'modified': None, 'size': 0}
+        self._dir_mtimes = {}
+        self._dir_keys = {}
+        self._children = {}
+        self._walk(self.root_dir, prefix, files, dirs)
+
+        self._files = files
+        self._dirs = dirs
+        self._scanned_at = time.monotonic()
+
+
+class DirectoryWatcher(threading.Thread):
+    """
+    Background thread that keeps a DirectoryIndex current.
+
+    Uses inotify (through the optional inotify_simple package) where available
+    and falls back to polling directory modification times every interval seconds.
+    Only the directories that changed are re-read.
+    """
+
+    def __init__(self, index, interval=2.0):
+        super().__init__(daemon=True, name=f'DirectoryWatcher-{index.root_dir}')
+        self.index = index
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._inotify = None
+        self._watches = {}
+        if inotify_simple is not None:
+            try:
+                self._inotify = inotify_simple.INotify()
+            except OSError:
+                self._inotify = None
+
+    @property
+    def backend(self):
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if self._inotify is not None:
+                changed = self._wait_inotify()
+            else:
+                self._stop_event.wait(self.interval)
+                changed = self.index.changed_dirs()
+            if changed and not self._stop_event.is_set():
+                self.index.apply_dir_changes(changed)
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def _sync_watches(self):
+        flags = inotify_simple.flags
+        mask = flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO | flags.CLOSE_WRITE
+        paths = set(self.index._dir_keys)
+        for path in paths - self._watches.keys():
+            try:
+                self._watches[path] = self._inotify.add_watch(path, mask)
+            except OSError:
+                continue
+        for path in self._watches.keys() - paths:
+            wd = self._watches.pop(path)
+            try:
+                self._inotify.rm_watch(wd)
+            except OSError:
+                pass
+
+    def _wait_inotify(self):
+        self._sync_watches()
+        paths_by_wd = {wd: path for path, wd in self._watches.items()}
+        changed = set()
+        for event in self._inotify.read(timeout=int(self.interval * 1000)):
+            if event.mask & inotify_simple.flags.Q_OVERFLOW:
+                return list(self.index._dir_keys)
+            path = paths_by_wd.get(event.wd)
+            if path is not None:
+                changed.add(path)
+        return list(changed)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_directory_index(root_dir, ttl=None):
+    """Return the shared DirectoryIndex for root_dir, creating it on first use"""
+    key = os.path.abspath(str(root_dir))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = DirectoryIndex(root_dir=root_dir, ttl=ttl)
+            _indexes[key] = index
+        elif ttl is not None:
+            index.ttl = ttl
+        return index
@@ -0,0 +1,127 @@
+import json
+
+
+class JSONStreamWriter:
+    """
+    Incremental writer of nested JSON objects and arrays.
+
+    Objects and arrays are only opened once a value is written inside them,
+    so empty ones are left out of the output, as in data_to_nested. Each call
+    returns the chunks of text to write; their concatenation is the same text
+    json.dumps(output, indent=indent) gives for the equivalent nested dict.
+    """
+
+    def __init__(self, indent=None):
+        self.indent = indent
+        self.item_separator = ',' if indent is not None else ', '
+        self.frames = []
+
+    def open(self, key=None, kind='dict', index=None):
+        """
+        Start an object (kind='dict') or array (kind='list').
+
+        Args:
+            key [str | None]: key in the parent object, None at the root or in arrays
+            index [int | None]: position in the parent array. Positions skipped
+                before it are written as empty objects.
+        """
+        self.frames.append({'key': key, 'kind': kind, 'index': index, 'opened': False, 'count': 0})
+        return []
+
+    def value(self, key, value):
+        """Write key and value in the current object"""
+        chunks = self._ensure_open()
+        depth = len(self.frames)
+        serialized = json.dumps(value, indent=self.indent)
+        if self.indent is not None:
+            serialized = serialized.replace('\n', self._newline(depth))
+        chunks.append(self._item_prefix(self.frames[-1], depth) + json.dumps(key) + ': ' + serialized)
+        return chunks
+
+    def close(self):
+        """End the current object or array. The root object is always written."""
+        if len(self.frames) == 1:
+            chunks = self._ensure_open()
+        else:
+            chunks = []
+        frame = self.frames.pop()
+        if not frame['opened']:
+            return chunks
+        closer = '}' if frame['kind'] == 'dict' else ']'
+        if frame['count']:
+            closer = self._newline(len(self.frames)) + closer
+        chunks.append(closer)
+        return chunks
+
+    def _newline(self, depth):
+        if self.indent is None:
+            return ''
+        return '\n' + ' ' * (self.indent * depth)
+
+    def _item_prefix(self, parent, depth):
+        separator = self.item_separator if parent['count'] else ''
+        parent['count'] += 1
+        return separator + self._newline(depth)
+
+    def _ensure_open(self):
+        chunks = []
+        for depth, frame in enumerate(self.frames):
+            if frame['opened']:
+                continue
+            if depth > 0:
+                parent = self.frames[depth - 1]
+                if frame['index'] is not None:
+                    while parent['count'] < frame['index']:
+                        chunks.append(self._item_prefix(parent, depth) + '{}')
+                prefix = self._item_prefix(parent, depth)
+                if frame['key'] is not None:
+                    prefix += json.dumps(frame['key']) + ': '
+                chunks.append(prefix)
+            chunks.append('{' if frame['kind'] == 'dict' else '[')
+            frame['opened'] = True
+        return chunks
+
+
+def build_nested(data):
+    """
+    Convert field entries (as in SchemaFormContainer.data) to nested dict
+    (data format), in a single pass over the fields
+
+    Each value is placed following the path of its field in the compiled
+    schema. Fields of the same (sub)form share the lookup of their parent.
+    Empty values are left out.
+
+    Args:
+        data [dict]: maps field ids to dicts with 'value' and 'path'
+    Returns:
+        output [dict]
+    """
+    output = dict()
+    parents = dict()
+    for v in data.values():
+        field_value = v['value']
+        if field_value not in ['', None]:
+            if isinstance(field_value, list):
+                field_value = [e['displayValue'] if isinstance(e, dict) else e for e in field_value]
+            path = tuple(v['path'])
+            parent = parents.get(path[:-1])
+            if parent is None:
+                parent = parents[path[:-1]] = _nested_parent(output, path)
+            parent[path[-1]] = field_value
+    return output
+
+
+def _nested_parent(output, path):
+    """Return the dict that holds the value at path in the nested output, creating the dicts and lists on the way"""
+    node = output
+    for key, next_key in zip(path[:-1], path[1:]):
+        if isinstance(node, list):
+            # Entries before this one may have no values
+            while len(node) <= key:
+                node.append(dict())
+            node = node[key]
+        else:
+            if key not in node:
+                node[key] = list() if isinstance(next_key, int) else dict()
+            node = node[key]
+    return node
@@ -0,0 +1,293 @@
+import json
+
+from .prefill import PrefillReport, iter_leaves, iter_json_leaves, ijson
+from .schema_plan import FieldSpec, FormSpec, ArraySpec
+from .validation import ValidationError, field_validator
+
+# Markers of forms and arrays in FormData.paths, fields map to their id
+_FORM = object()
+_ARRAY = object()
+
+
+def new_state():
+    """
+    Empty form state, as kept per browser session by SchemaFormContainer.
+
+    Returns:
+        state [dict]: with keys
+            data: maps field ids to their properties and value
+            dirty: ids of the fields changed since the last forms values update
+            array_lengths: maps array ids to their number of entries
+            names_by_class, links_by_target: name fields by owner class and
+                link fields by target class
+            stale_classes: classes whose names changed since link options were last sent
+            errors: errors of the fields checked by validate
+            unvalidated: ids of the fields changed since the last validate
+    """
+    return {
+        'data': {}, 'dirty': set(), 'array_lengths': {},
+        'names_by_class': {}, 'links_by_target': {}, 'stale_classes': set(),
+        'errors': {}, 'unvalidated': set()
+    }
+
+
+class FormData:
+    """
+    Field registry, prefill and validation of the compiled schema of a
+    container, on plain state dicts (see new_state). Imports no Dash.
+
+    SchemaFormContainer delegates to it with the state of the current
+    session. Scripts can use it directly, e.g. to validate stored metadata:
+
+        form_data = FormData('myform', compile_schema(schema))
+        state = new_state()
+        form_data.register_plan(state)
+        report = form_data.prefill(state, metadata)
+        errors = form_data.validate(state)
+
+    Args:
+        id [str]: id of the container, prefix of the field ids
+        plan [SchemaPlan | None]: compiled schema
+        root_path [Path | None]: parent of DATA_PATH; required path fields
+            holding only it count as missing
+    """
+
+    def __init__(self, id, plan=None, root_path=None):
+        self.id = id
+        self.plan = plan
+        self.root_path = root_path
+        # Maps the paths of the compiled forms, arrays and fields, see register_paths
+        self.paths = {}
+        self.validators = {}
+
+    def register_plan(self, state):
+        """Register all forms, arrays and fields of the plan, with their default values in state"""
+        self.register_paths(self.plan.forms)
+        self.register_fields(state, self.plan.fields)
+        for spec in self.plan.forms:
+            self._register_lengths(state, spec)
+
+    def _register_lengths(self, state, spec):
+        if isinstance(spec, FormSpec):
+            for child in spec.children:
+                self._register_lengths(state, child)
+        elif isinstance(spec, ArraySpec):
+            state['array_lengths'][self.field_id(spec.path)] = len(spec.items)
+            for item in spec.items:
+                self._register_lengths(state, item)
+
+    def field_id(self, path):
+        """Component id of the field or form at a path of the compiled schema"""
+        return f'{self.id}-' + '-'.join(map(str, path))
+
+    def compound_id(self, spec):
+        """Pattern-matching id of the input component of a compiled field"""
+        return {
+            'type': 'metadata-input',
+            'index': self.field_id(spec.path),
+            'data_type': spec.data_type,
+            'container_id': self.id
+        }
+
+    def register_paths(self, specs):
+        """Map the paths of compiled forms, arrays and fields, used to look up prefilled metadata"""
+        for spec in specs:
+            if isinstance(spec, FieldSpec):
+                index = self.field_id(spec.path)
+                self.paths[spec.path] = index
+                self.validators[index] = field_validator(self.plan, spec)
+            elif isinstance(spec, FormSpec):
+                self.paths[spec.path] = _FORM
+                self.register_paths(spec.children)
+            elif isinstance(spec, ArraySpec):
+                self.paths[spec.path] = _ARRAY
+                self.register_paths(spec.items)
+
+    def register_fields(self, state, fields):
+        """Add compiled fields, with their default values, to the data of state"""
+        data = state['data']
+        for spec in fields:
+            index = self.field_id(spec.path)
+            data[index] = {
+                'compound_id': self.compound_id(spec),
+                'owner_class': spec.owner_class,
+                'target': spec.target,
+                'value': spec.default,
+                'required': spec.required,
+                'path': spec.path
+            }
+            self.index_field(state, index, data[index])
+            state['unvalidated'].add(index)
+
+    def unregister_field(self, state, index):
+        """Remove a field from the data of state"""
+        entry = state['data'].pop(index, None)
+        if entry is not None:
+            self.unindex_field(state, index, entry)
+        state['dirty'].discard(index)
+        # Errors are dropped on the next validate
+        state['unvalidated'].add(index)
+
+    def index_field(self, state, index, entry):
+        """Add a name or link field to the indexes of state"""
+        data_type = entry['compound_id']['data_type']
+        if data_type == 'name':
+            state['names_by_class'].setdefault(entry['owner_class'], []).append(index)
+        elif data_type == 'link':
+            state['links_by_target'].setdefault(entry['target'], []).append(index)
+
+    def unindex_field(self, state, index, entry):
+        """Remove a name or link field from the indexes of state"""
+        data_type = entry['compound_id']['data_type']
+        if data_type == 'name':
+            state['names_by_class'][entry['owner_class']].remove(index)
+            state['stale_classes'].add(entry['owner_class'])
+        elif data_type == 'link':
+            state['links_by_target'][entry['target']].remove(index)
+
+    def replace_data(self, state, data):
+        """Replace the fields of state, and mark all of them changed"""
+        # Link options of the classes that had names are refreshed too
+        state['stale_classes'].update(state['names_by_class'])
+        state['data'] = data
+        state['names_by_class'] = {}
+        state['links_by_target'] = {}
+        state['errors'] = {}
+        state['dirty'] = set()
+        for index, entry in data.items():
+            self.index_field(state, index, entry)
+        self.mark_dirty(state)
+
+    def set_field_value(self, state, index, value):
+        """Set the value of a field and mark it changed"""
+        entry = state['data'][index]
+        if entry['compound_id']['data_type'] == 'name' and entry['value'] != value:
+            state['stale_classes'].add(entry['owner_class'])
+        entry['value'] = value
+        state['dirty'].add(index)
+        state['unvalidated'].add(index)
+
+    def mark_dirty(self, state, indexes=None):
+        """
+        Mark fields whose values were changed directly in data.
+
+        Args:
+            indexes [iterable | None]: field ids, all fields if None
+        """
+        indexes = list(state['data'] if indexes is None else indexes)
+        state['dirty'].update(indexes)
+        state['unvalidated'].update(indexes)
+        for k in indexes:
+            entry = state['data'][k]
+            if entry['compound_id']['data_type'] == 'name':
+                state['stale_classes'].add(entry['owner_class'])
+
+    def prefill(self, state, metadata):
+        """
+        Set the values of all fields present in nested metadata, in one pass.
+
+        Keys are looked up by their path in the compiled schema. Keys that do
+        not match the plan are collected in the report instead of
+        interrupting the load.
+
+        Args:
+            metadata [dict]: nested metadata (data format)
+        Returns:
+            report [PrefillReport]
+        """
+        return self._prefill(state, iter_leaves(metadata))
+
+    def prefill_json(self, state, fp):
+        """
+        Like prefill, reading the metadata from a JSON file object. With the
+        optional ijson package the file is parsed incrementally.
+        """
+        if ijson is None:
+            return self.prefill(state, json.load(fp))
+        return self._prefill(state, iter_json_leaves(fp))
+
+    def _prefill(self, state, leaves):
+        data = state['data']
+        dirty = state['dirty']
+        stale = state['stale_classes']
+        unvalidated = state['unvalidated']
+        paths = self.paths
+        applied = 0
+        report = {'unknown': [], 'invalid': [], 'skipped': []}
+        reported = set()
+        for path, value in leaves:
+            index = paths.get(path)
+            entry = data.get(index) if isinstance(index, str) else None
+            if entry is not None and isinstance(value, list) == (entry['compound_id']['data_type'] == 'tags'):
+                if entry['compound_id']['data_type'] == 'name' and entry['value'] != value:
+                    stale.add(entry['owner_class'])
+                entry['value'] = value
+                dirty.add(index)
+                unvalidated.add(index)
+                applied += 1
+                continue
+            category, error_path = self._prefill_error(state, path)
+            if error_path not in reported:
+                reported.add(error_path)
+                report[category].append(error_path)
+        return PrefillReport(applied=applied, **report)
+
+    def _prefill_error(self, state, path):
+        # Report the first key of path that does not fit the plan
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            kind = self.paths.get(prefix)
+            if kind is _FORM and isinstance(prefix[-1], int):
+                # Entry of an array beyond its current length in this state
+                if prefix[-1] >= state['array_lengths'].get(self.field_id(prefix[:-1]), 0):
+                    return 'unknown', prefix
+            elif kind is _ARRAY:
+                continue
+            elif kind is None or (isinstance(kind, str) and kind not in state['data']):
+                if self.plan is not None and prefix[-1] in self.plan.skipped:
+                    return 'skipped', prefix
+                return 'unknown', prefix
+            elif isinstance(kind, str):
+                return 'invalid', prefix
+        return 'invalid', path
+
+    def validate(self, state):
+        """
+        Check the values of data against the constraints of the schema.
+
+        Validators are compiled once per field definition. Only the fields
+        changed since the previous call are checked again, the errors of the
+        other fields are kept in state.
+
+        Returns:
+            errors [list]: ValidationError of each failed constraint
+        """
+        data = state['data']
+        errors = state['errors']
+        for k in state['unvalidated']:
+            entry = data.get(k)
+            if entry is None:
+                errors.pop(k, None)
+                continue
+            field_errors = self.validators[k].validate(entry['value'])
+            if self.is_missing(entry):
+                field_errors.insert(0, ('required', 'is required'))
+            if field_errors:
+                errors[k] = [list(e) for e in field_errors]
+            else:
+                errors.pop(k, None)
+        state['unvalidated'].clear()
+        return [
+            ValidationError(field=k, path=tuple(data[k]['path']), rule=rule, message=message, anchor=self.field_anchor(k))
+            for k, field_errors in errors.items()
+            for rule, message in field_errors
+        ]
+
+    def field_anchor(self, index):
+        """Id of the Div wrapping the input component of a field"""
+        return 'wrapper-' + index + '-metadata-input'
+
+    def is_missing(self, entry):
+        """Whether a field of data is required and has no value"""
+        field_value = entry['value']
+        return entry['required'] and (field_value is None or (isinstance(field_value, str) and field_value.isspace()) or field_value == '' or (self.root_path is not None and str(field_value) == str(self.root_path)))
@@ -1,28 +1,66 @@
+import copy
 import json
+import secrets
+import threading
+import time
 import warnings
 
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
-import numpy as np
 from dash.dependencies import Input, Output, State, ALL, MATCH
+from dash.development.base_component import Component
 from dash_cool_components import TagInput, DateTimePicker
 from pathlib import Path
-from collections import Counter
 
-from .utils import make_filebrowser_modal
+from .cache import LRUCache
+from .export import JSONStreamWriter, build_nested
+from .form_data import FormData, new_state
+from .state_store import MemoryStateStore, init_sessions, request_state
+from .metrics import init_metrics
+from .profiling import ConstructionProfiler
+from .schema_plan import (
+    compile_schema, compile_array_item, iter_fields, iter_plan_fields, iter_arrays, path_formats, FieldSpec, FormSpec,
+    ArraySpec
+)
+from .utils import (
+    make_filebrowser_modal, register_filebrowser_callbacks, filebrowser_id, triggered_id, matched_index
+)
+
+
+def serialize_component(component):
+    """Convert a component tree to the plain JSON structure sent to the browser"""
+    if isinstance(component, Component):
+        serialized = component.to_plotly_json()
+        serialized['props'] = {k: serialize_component(v) for k, v in serialized['props'].items()}
+        return serialized
+    if isinstance(component, (list, tuple)):
+        return [serialize_component(c) for c in component]
+    if isinstance(component, dict):
+        return {k: serialize_component(v) for k, v in component.items()}
+    return component
 
 
 class SchemaFormItem(dbc.FormGroup):
-    def __init__(self, label, value, input_id, parent, required=False):
+    def __init__(self, spec, parent, subforms=None):
         super().__init__([])
+        start = time.perf_counter()
 
         self.parent = parent
-
-        field_input = self.get_field_input(value=value, input_id=input_id, required=required)
-
-        if required:
+        self.spec = spec
+        self.subforms = subforms or []
+
+        label = dbc.Label(spec.name)
+        input_id = self.parent.container.field_id(spec.path)
+        field_input = self.get_field_input(spec=spec, input_id=input_id, subforms=subforms)
+
+        if self.parent.container.compact:
+            # Label and input are the columns of the FormGroup row
+            self.row = True
+            label_children = [spec.name, html.Span('*', style={'color': 'red'})] if spec.required else spec.name
+            self.children = [dbc.Label(label_children, width=3), field_input]
+        elif spec.required:
             self.children = [
                 dbc.Row([
                     dbc.Col([label, html.Span('*', style={'color': 'red'})], width={'size': 3}),
@@ -37,7 +75,10 @@ class SchemaFormItem(dbc.FormGroup):
                 ])
             ]
 
-    def get_field_input(self, value, input_id, description=None, required=False):
+        if self.parent.container.profiler is not None:
+            self.parent.container.profiler.add_item(self, time.perf_counter() - start)
+
+    def get_field_input(self, spec, input_id, subforms=None):
         """
         Get component for user interaction. Types:
         - string
@@ -51,147 +92,121 @@ class SchemaFormItem(dbc.FormGroup):
         - path to file or dir
         """
 
-        owner_class = self.parent.owner_class
-        compound_id = {
-            'type': 'metadata-input',
-            'index': input_id,
-            'data_type': '',
-            'container_id': self.parent.container.id
-        }
-
-        default = None
-
-        if isinstance(value, list):
-            compound_id['data_type'] = 'list'
-            field_input = html.Div(value)  # id=compound_id)
+        if isinstance(spec, ArraySpec):
+            compound_id = {
+                'type': 'metadata-input',
+                'index': input_id,
+                'data_type': 'list',
+                'container_id': self.parent.container.id
+            }
+            container = self.parent.container
+            field_input = html.Div([
+                html.Div(subforms, id=container.array_control_id('items', input_id)),
+                # Number of entries in the layout, so callbacks do not upload them
+                dcc.Store(id=container.array_control_id('count', input_id), data=len(subforms or [])),
+                dbc.ButtonGroup([
+                    dbc.Button('Add', id=container.array_control_id('add', input_id), color='link', size='sm'),
+                    dbc.Button('Remove', id=container.array_control_id('remove', input_id), color='link', size='sm')
+                ])
+            ])
             description = ''
 
-        elif 'enum' in value:
-            input_values = [{'label': e, 'value': e} for e in value['enum']]
-            default = value.get('default', '')
-            compound_id['data_type'] = 'choicestring'
-            field_input = dcc.Dropdown(
-                id=compound_id,
-                options=input_values,
-                value=default,
-                className='dropdown_input'
-            )
+        else:
+            compound_id = self.parent.container.compound_id(spec)
+            data_type = spec.data_type
+            value = spec.schema
+            description = spec.description
+            # Current value of the field, so bodies rendered later show it
+            props = self.parent.container.field_props(spec)
+
+            if data_type == 'choicestring':
+                input_values = [{'label': e, 'value': e} for e in value['enum']]
+                field_input = dcc.Dropdown(
+                    id=compound_id,
+                    options=input_values,
+                    className='dropdown_input',
+                    **props
+                )
 
-        elif 'target' in value:
-            compound_id['data_type'] = 'link'
-            field_input = dcc.Dropdown(
-                id=compound_id,
-                options=[],
-                value='',
-                className='dropdown_input',
-                searchable=False,
-                clearable=False
-            )
+            elif data_type == 'link':
+                field_input = dcc.Dropdown(
+                    id=compound_id,
+                    className='dropdown_input',
+                    searchable=False,
+                    clearable=False,
+                    **props
+                )
 
-        elif 'type' in value and value['type'] == 'array':
-            compound_id['data_type'] = 'tags'
-            field_input = TagInput(
-                id=compound_id,
-                wrapperStyle={'box-shadow': 'none', 'border-radius': '2px', 'line-height': '5px'},
-                inputStyle={'line-height': '15px', 'height': '15px'}
-            )
+            elif data_type == 'tags':
+                field_input = TagInput(
+                    id=compound_id,
+                    wrapperStyle={'box-shadow': 'none', 'border-radius': '2px', 'line-height': '5px'},
+                    inputStyle={'line-height': '15px', 'height': '15px'},
+                    **props
+                )
 
-        elif 'format' in value and value['format'] == 'date-time':
-            compound_id['data_type'] = 'datetime'
-            field_input = DateTimePicker(
-                id=compound_id,
-            )
+            elif data_type == 'datetime':
+                field_input = DateTimePicker(
+                    id=compound_id,
+                    **props
+                )
 
-        elif 'format' in value and value['format'] == 'long':
-            compound_id['data_type'] = 'string'
-            field_input = dbc.Textarea(
-                id=compound_id,
-                className='string_input',
-                bs_size="lg",
-                style={'font-size': '16px'}
-            )
+            elif data_type == 'string' and value.get('format') == 'long':
+                field_input = dbc.Textarea(
+                    id=compound_id,
+                    className='string_input',
+                    bs_size="lg",
+                    style={'font-size': '16px'},
+                    **props
+                )
 
-        elif 'format' in value and value['format'] in ['file', 'directory']:
-            compound_id['data_type'] = 'path'
-            input_path = dbc.Input(
-                id=compound_id,
-                className='string_input',
-                type='input'
-            )
-            btn_id = "open-filebrowser-" + compound_id['index']
-            btn_open_filebrowser = dbc.Button(
-                id=btn_id,
-                children=[html.I(className="far fa-folder")],
-                style={'background-color': 'transparent', 'color': 'black', 'border': 'none'}
-            )
-            modal_id = "modal-filebrowser-" + compound_id['index']
-            modal = make_filebrowser_modal(
-                parent_app=self.parent.container.parent_app,
-                modal_id=modal_id,
-                display=value['format']
-            )
-            # Create internal trigger component and add it to parent Container
-            trigger_id = {'type': 'internal-trigger-update-forms-values', 'parent': self.parent.container.id,
-                          'index': compound_id['index']}
-            trigger = html.Div(id=trigger_id, style={'display': 'none'})
-            self.parent.container.children_triggers.append(trigger)
-
-            self.register_filebrowser_callbacks(
-                modal_id=modal_id,
-                button_id=btn_id,
-                trigger_id=trigger_id
-            )
+            elif data_type == 'path':
+                input_path = dbc.Input(
+                    id=compound_id,
+                    className='string_input',
+                    type='input',
+                    **props
+                )
+                btn_open_filebrowser = dbc.Button(
+                    id={'type': 'filebrowser-open', 'container': self.parent.container.id,
+                        'display': value['format'], 'index': compound_id['index']},
+                    children=[html.I(className="far fa-folder")],
+                    style={'background-color': 'transparent', 'color': 'black', 'border': 'none'}
+                )
+                self.parent.container.get_filebrowser_modal(display=value['format'])
 
-            field_input = html.Div([
-                dbc.InputGroup([
+                field_input = dbc.InputGroup([
                     input_path,
                     dbc.InputGroupAddon(btn_open_filebrowser, addon_type="append"),
-                ]),
-                modal
-            ])
+                ])
 
-        elif value['type'] == 'boolean':
-            compound_id['data_type'] = 'boolean'
-            default = value.get('default', False)
-            field_input = dbc.Checkbox(
-                id=compound_id,
-                checked=default
-            )
+            elif data_type == 'boolean':
+                field_input = dbc.Checkbox(
+                    id=compound_id,
+                    **props
+                )
 
-        else:
-            input_type = value['type']
-            if input_type == 'number':
-                step = 1
-                compound_id['data_type'] = 'number'
-            elif 'name' in input_id:
-                step = ''
-                compound_id['data_type'] = 'name'
             else:
-                step = ''
-                compound_id['data_type'] = 'string'
-            field_input = dbc.Input(
-                id=compound_id,
-                className='string_input',
-                type=input_type,
-                step=step
-            )
+                step = 1 if data_type == 'number' else ''
+                field_input = dbc.Input(
+                    id=compound_id,
+                    className='string_input',
+                    type=value['type'],
+                    step=step,
+                    **props
+                )
 
-        # Add data
-        if not isinstance(value, list):
-            self.parent.container.data.update({
-                input_id: {
-                    'compound_id': compound_id,
-                    'owner_class': str(owner_class),
-                    'target': value.get('target', None),
-                    'value': default,
-                    'required': required
-                }
-            })
+        if self.parent.container.compact:
+            # The description is shown by the browser on hover, without a Tooltip component
+            props = {'title': description} if description else {}
+            return html.Div(
+                field_input,
+                id='wrapper-' + compound_id['index'] + '-' + compound_id['type'],
+                className='col-8',
+                **props
+            )
 
         # Add tooltip to input field
-        if description is None:
-            description = value.get('description', '')
-
         input_and_tooltip = html.Div([
             html.Div(
                 field_input,
@@ -205,159 +220,76 @@ class SchemaFormItem(dbc.FormGroup):
 
         return input_and_tooltip
 
-    def register_filebrowser_callbacks(self, modal_id, button_id, trigger_id):
-        """Register callbacks for filebroswer component"""
-
-        # trigger_id = {type: internal-trigger-update-form-values, index: index_class}
-
-        @self.parent.container.parent_app.callback(
-            Output(modal_id, 'is_open'),
-            [
-                Input(button_id, 'n_clicks'),
-                Input(modal_id + "-close", 'n_clicks')
-            ],
-            [State(modal_id, 'is_open')]
-        )
-        def toggle_filebrowser(click_open, click_close, is_open):
-            """Toggle modal open/close"""
-            if click_open or click_close:
-                return not is_open
-            else:
-                return is_open
-
-        @self.parent.container.parent_app.callback(
-            [Output(trigger_id, 'children'), Output(f'{modal_id}-close', 'n_clicks')],
-            [Input('submit-filebrowser-' + modal_id, 'n_clicks')],
-            [State('chosen-filebrowser-' + modal_id, 'value')]
-        )
-        def get_path_values(click, chosen_path):
-            """
-            Get path value from file browser, update Container data and trigger
-            frontend components updates
-            """
-            if click:
-                # Update Container internal dictionary value
-                self.parent.container.data[trigger_id['index']]['value'] = chosen_path
-                # Triggers components update
-                return str(np.random.rand()), 1
-            return '', None
-
 
 class SchemaForm(dbc.Card):
     """
     Form generated by JSON Schema.
+
+    Built from a compiled FormSpec, see schema_plan.compile_schema.
+    With render_body=False only the header is built and the form starts
+    collapsed; the container renders its body on the first expand.
     """
 
-    def __init__(self, schema, key, container=None, parent_form=None):
+    def __init__(self, spec, container, key=None, render_body=True):
         super().__init__([])
+        start = time.perf_counter()
 
-        self.schema = schema
-        self.owner_class = schema.get('tag', '')
-        self.parent_form = parent_form
-        self.skiped_forms = []
+        self.spec = spec
+        self.schema = spec.schema
+        self.owner_class = spec.owner_class
+        self.container = container
+        self.skiped_forms = list(spec.skipped)
 
-        # Unique Card IDs are composed by parent id + key from json schema
-        if parent_form is None:
-            self.id = f'{container.id}-{key}'
-            self.container = container
-        else:
-            self.id = parent_form.id + '-' + key
-            self.container = parent_form.container
+        if key is None:
+            key = spec.name
 
-        self.definitions = self.container.schema.get('definitions', dict())
+        # Unique Card IDs are composed by container id + path from json schema
+        self.id = container.field_id(spec.path)
+        collapsible_index = f'{self.id}-collapsible'
 
-        header_text = schema.get('title', self.id.split('-')[-1])
         self.header = dbc.CardHeader(
-            [dbc.Button(html.H4(header_text, style={"color": 'black'}, className="title_" + key), color='link', id={"type": "collapsible-toggle", "container": f"{self.container.id}", 'index': f'{self.id}-collapsible'})],
+            [dbc.Button(html.H4(spec.title, style={"color": 'black'}, className="title_" + key), color='link', id={"type": "collapsible-toggle", "container": f"{self.container.id}", 'index': collapsible_index})],
             style={'padding': '10px'}
         )
-        self.body = dbc.CardBody([])
+        self.items = []
 
-        self.required_fields = schema.get('required', '')
+        self.required_fields = spec.required
 
         self.style = {'padding': '0px', 'margin-top': '10px'}
 
         # Construct form
-        if 'properties' in schema:
-            self.make_form(properties=schema['properties'])
-
-        self.body = dbc.Collapse(self.body, id={"type": 'collapsible-body', "container": f"{self.container.id}" ,"index": f'{self.id}-collapsible'}, is_open=True)
-        self.children = [self.header, self.body]
-
-
-    def make_form(self, properties):
-        """Iterates over properties of schema and assembles form items"""
-        for k, v in properties.items():
-            required = k in self.required_fields
-
-            if 'renderForm' in v and not v['renderForm']:
-                self.skiped_forms.append(k)
-                continue
-
-            # If item is an object or reference to an object on definitions, make subform
-            if 'type' in v and v['type'] == 'object':
-                item = SchemaForm(schema=v, key=k, parent_form=self)
-                self.body.children.append(item)
-                continue
-            elif "$ref" in v:
-                template_name = v["$ref"].split('/')[-1]
-                schema = self.definitions[template_name]
-                item = SchemaForm(schema=schema, key=k, parent_form=self)
-                self.body.children.append(item)
-                continue
-
-            # If item is an array
-            if 'type' in v and (v['type'] == 'array'):
-                # v['type'] == array requires also v['items'] definition
-                if v.get('items') is None:
-                    warnings.warn(f"Schema badly defined for field '{k}'. Array fields require definition of 'type'. Skipping it...")
-                    continue
-
-                # If item is an array of subforms, it should have 'minItems'
-                if 'minItems' in v: 
-                    value = []
-                    if '$ref' in v['items']:  # search for reference somewhere else in the root schema
-                        for i in v['items']['$ref'].split('/'):
-                            if i == '#':
-                                aux = self.container.schema
-                            else:
-                                aux = aux.get(i)
-                        schema = aux
-                    else:
-                        schema = v['items']
-                    
-                    # Creates 'minItems' number of subforms
-                    for index in range(v['minItems']):
-                        iform = SchemaForm(schema=schema, key=f'{k}-{index}', parent_form=self)
-                        value.append(iform)
-
-                # If item is an array of strings (undefined 'minItems')
-                elif isinstance(v['items'], dict):
-                    value = v
-
-                # Other cases
-                else:
-                    value = v
-
-            # If item is a simple input field, e.g. description
-            elif 'type' in v and v['type'] in ['string', 'number', 'boolean']:
-                value = v
-
-            # If item is something not yet implemented
+        if render_body:
+            self.make_form(children=spec.children)
+
+        # Not self.body, which is a prop of dbc.Card and would send the body twice
+        self.card_body = dbc.CardBody(self.items)
+        if self.container.lazy_subforms:
+            self.card_body.id = {"type": 'collapsible-content', "container": f"{self.container.id}", "index": collapsible_index}
+            if not render_body:
+                self.container.lazy_forms[collapsible_index] = (spec, key)
+
+        self.collapse = dbc.Collapse(self.card_body, id={"type": 'collapsible-body', "container": f"{self.container.id}" ,"index": collapsible_index}, is_open=render_body)
+        self.children = [self.header, self.collapse]
+
+        if container.profiler is not None:
+            container.profiler.add_form(self, time.perf_counter() - start)
+
+    def make_form(self, children):
+        """Iterates over compiled children of the form and assembles form items"""
+        render_body = not self.container.lazy_subforms
+        for child in children:
+            if isinstance(child, FormSpec):
+                item = SchemaForm(spec=child, container=self.container, render_body=render_body)
+            elif isinstance(child, ArraySpec):
+                # Creates 'minItems' number of subforms
+                subforms = [
+                    SchemaForm(spec=item_spec, container=self.container, key=f'{child.name}-{item_spec.name}', render_body=render_body)
+                    for item_spec in child.items
+                ]
+                item = SchemaFormItem(spec=child, parent=self, subforms=subforms)
             else:
-                warnings.warn(f'Field input not yet implemented for {k}. Skipping it...')
-                continue
-
-            label = dbc.Label(k)
-            input_id = f'{self.id}-{k}'
-            item = SchemaFormItem(
-                label=label,
-                value=value,
-                input_id=input_id,
-                parent=self,
-                required=required
-            )
-            self.body.children.append(item)
+                item = SchemaFormItem(spec=child, parent=self)
+            self.items.append(item)
 
 
 class SchemaFormContainer(html.Div):
@@ -367,17 +299,99 @@ class SchemaFormContainer(html.Div):
     IDs exposed for external trigger of update functions:
     id + '-external-trigger-update-forms-values'
     id + '-external-trigger-update-links-values'
+
+    The values of all rendered fields are kept in the browser, in the Store
+    id + '-values-store', by a clientside callback. Callbacks of the app can
+    take it as State and apply it with read_values_store.
+
+    With lazy_file_tree=True the file browsers of path fields send only the
+    top level of DATA_PATH and load each directory's children when it is selected.
+    With watch_file_tree=True a background watcher keeps the directory index
+    current and open file browsers receive only the entries added and removed.
+
+    With cache_layout=True the serialized component tree and field registry are
+    stored in SchemaFormContainer.layout_cache, keyed by schema hash and container
+    id, and reused by later containers built for the same schema.
+
+    With lazy_subforms=True nested subforms are sent collapsed with only their
+    header, and the body of each one is rendered by the server the first time it
+    is expanded. Values of fields not rendered yet are kept in data.
+
+    Entries of arrays of subforms are appended and removed one at a time with
+    add_array_item and remove_array_item, or with the Add/Remove buttons of the
+    array, which update only that array's children and data entries. When the
+    page is reloaded, each array is brought back to the entries of the session.
+
+    Forms values updates send only the fields changed on the server since the
+    previous update. Change values with update_data or set_field_value, or call
+    mark_dirty after writing to data directly.
+
+    Field values are kept per browser session, identified by a cookie, in
+    state_store (by default a MemoryStateStore). Outside of requests, data
+    is the default state, which new sessions start from.
+
+    validate checks the values against the schema constraints, re-checking
+    only the fields changed since the previous call.
+
+    With clientside_validation=True the required, type, enum and pattern rules
+    are also checked in the browser on every change: text inputs of failing
+    fields are marked invalid, the errors are kept in the Store
+    id + '-validation-errors', and the button with id submit_button_id, if
+    given, is disabled while there are errors.
+
+    With compact=True each field is rendered as a FormGroup row holding only
+    its label and the Div wrapping its input, and descriptions are shown as
+    the title of that Div, instead of a Row, two Cols and a Tooltip per field.
+
+    With profile=True the time and serialized size of each subform and of the
+    fields of each data type are recorded in construction_profile, see
+    profiling.ConstructionProfiler. profile='memory' also records the
+    tracemalloc peak of the build, which slows it down.
+
+    With metrics_route, e.g. '/metrics', the count, latency histogram and
+    request and response bytes of the server callbacks of the container are
+    recorded and served on that route of parent_app.server, in Prometheus
+    text format. A server has one metrics route, shared by its containers.
     """
 
-    def __init__(self, id, schema, parent_app, root_path=None):
+    layout_cache = LRUCache(maxsize=64)
+
+    def __init__(self, id, schema, parent_app, root_path=None, lazy_file_tree=False,
+                 watch_file_tree=False, cache_layout=False, lazy_subforms=False, state_store=None,
+                 clientside_validation=False, submit_button_id=None, metrics_route=None,
+                 profile=False, compact=False):
         super().__init__([])
+        callbacks_before = set(parent_app.callback_map)
+        self.metrics = None
 
         self.id = id
         self.schema = schema
         self.parent_app = parent_app
-        self.data = {}
+        self.lazy_file_tree = lazy_file_tree
+        self.watch_file_tree = watch_file_tree
+        self.cache_layout = cache_layout
+        self.lazy_subforms = lazy_subforms
+        self.compact = compact
+        self.state_store = state_store if state_store is not None else MemoryStateStore()
+        self.clientside_validation = clientside_validation
+        self.submit_button_id = submit_button_id
+        self.validation_registered = False
+        # State seen outside of requests, and copied to each new session
+        self.default_state = new_state()
+        self.plan = compile_schema(schema) if schema else None
         self.children_forms = []
         self.skiped_forms = []
+        self.file_browsers = {}
+        self.filebrowser_modals = {}
+        # Displays whose file browser callbacks are registered
+        self.filebrowser_displays = set()
+        self.lazy_forms = {}
+        self.arrays = {}
+        self.array_callbacks_registered = False
+        self.array_items = {}
+        self.profiler = ConstructionProfiler(trace_memory=profile == 'memory') if profile else None
+        self.construction_profile = None
+        self._arrays_lock = threading.Lock()
 
         if root_path is not None:
             self.parent_app.server.config['DATA_PATH'] = root_path
@@ -385,6 +399,9 @@ class SchemaFormContainer(html.Div):
             self.parent_app.server.config['DATA_PATH'] = Path.cwd()
 
         self.root_path = Path(self.parent_app.server.config['DATA_PATH']).parent
+        # Field registry, prefill and validation, on the state of the current session
+        self.form_data = FormData(id, plan=self.plan, root_path=self.root_path)
+        init_sessions(self.parent_app.server)
 
         # Hidden components that serve to trigger callbacks
         self.children_triggers = [
@@ -393,11 +410,22 @@ class SchemaFormContainer(html.Div):
             html.Div(id=f'{id}-external-trigger-update-internal-dict', style={'display': 'none'}),
             html.Div(id=f'{id}-output-update-finished-verification', style={'display': 'none'}),
             html.Div(id=id + '-trigger-update-links-values', style={'display': 'none'}),
-            html.Div(id=id + '-output-placeholder-links-values', style={'display': 'none'})
+            html.Div(id=id + '-output-placeholder-links-values', style={'display': 'none'}),
+            dcc.Store(id=f'{id}-values-store')
         ]
+        if clientside_validation:
+            self.children_triggers.append(dcc.Store(id=f'{id}-validation-errors'))
 
         if schema:
-            self.construct_children_forms()
+            if self.profiler is not None:
+                self.profiler.start()
+                self.construct_children_forms()
+                self.profiler.stop()
+                self.construction_profile = self.profiler.report(self)
+                # Bodies rendered later are not profiled
+                self.profiler = None
+            else:
+                self.construct_children_forms()
         else:
             self.children = self.children_triggers
 
@@ -419,15 +447,6 @@ class SchemaFormContainer(html.Div):
             Output(dict(_args_dict, data_type='number'), 'value'),
             Output(f'{self.id}-trigger-update-links-values', 'children')
         ]
-        self.update_forms_values_callback_states = [
-            State(dict(_args_dict, data_type='path'), 'value'),
-            State(dict(_args_dict, data_type='boolean'), 'checked'),
-            State(dict(_args_dict, data_type='string'), 'value'),
-            State(dict(_args_dict, data_type='datetime'), 'value'),
-            State(dict(_args_dict, data_type='tags'), 'value'),
-            State(dict(_args_dict, data_type='name'), 'value'),
-            State(dict(_args_dict, data_type='number'), 'value'),
-        ]
 
         self.parent_app.clientside_callback(
             """
@@ -452,74 +471,56 @@ class SchemaFormContainer(html.Div):
             [State({"type":'collapsible-body', "container": f'{self.id}', "index": MATCH}, 'is_open')]
         )
 
+        # Values of all rendered fields are collected in the browser, so the server
+        # reads them from a single Store instead of one State per data type
+        self.parent_app.clientside_callback(
+            """
+            function(){
+                const values = {}
+                dash_clientside.callback_context.inputs_list.forEach(group => group.forEach(e => {
+                    values[e.id.index] = (typeof e.value === "undefined") ? null : e.value
+                }))
+                return values
+            }
+            """,
+            Output(f'{self.id}-values-store', 'data'),
+            [
+                Input(dict(_args_dict, data_type='path'), 'value'),
+                Input(dict(_args_dict, data_type='boolean'), 'checked'),
+                Input(dict(_args_dict, data_type='string'), 'value'),
+                Input(dict(_args_dict, data_type='datetime'), 'value'),
+                Input(dict(_args_dict, data_type='tags'), 'value'),
+                Input(dict(_args_dict, data_type='link'), 'value'),
+                Input(dict(_args_dict, data_type='name'), 'value'),
+                Input(dict(_args_dict, data_type='number'), 'value'),
+                Input(dict(_args_dict, data_type='choicestring'), 'value'),
+            ]
+        )
+
         @self.parent_app.callback(
             Output(f'{self.id}-output-update-finished-verification', 'children'),
             [Input(f'{self.id}-external-trigger-update-internal-dict', 'children')],
-            [
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'path', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'boolean', 'index': ALL}, 'checked'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'string', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'datetime', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'tags', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'link', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'name', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': 'number', 'index': ALL}, 'value'),
-                State({'type': 'metadata-input', 'container_id': self.id, 'data_type': ALL, 'index': ALL}, 'id'),
-            ]
+            [State(f'{self.id}-values-store', 'data')]
         )
-        def update_internal_dict(trigger, path_values, boolean_values,
-                                 string_values, datetime_values, tags_values,
-                                 link_values, name_values, number_values, ids):
+        def update_internal_dict(trigger, values):
 
             if trigger is None:
                 return []
 
-            counter = Counter()
-
-            for e in ids:
-                k = e['index']
-                if e['data_type'] == 'path':
-                    path_v = path_values[counter['paths']] if path_values[counter['paths']] is not None else ''
-                    field_value = str(self.root_path / path_v)
-                    counter['paths'] += 1
-                elif e['data_type'] == 'boolean':
-                    field_value = boolean_values[counter['booleans']]
-                    counter['booleans'] += 1
-                elif e['data_type'] == 'datetime':
-                    field_value = datetime_values[counter['datetimes']]
-                    counter['datetimes'] += 1
-                elif e['data_type'] == 'string':
-                    field_value = string_values[counter['strings']]
-                    counter['strings'] += 1
-                elif e['data_type'] == 'name':
-                    field_value = name_values[counter['names']]
-                    counter['names'] += 1
-                elif e['data_type'] == 'number':
-                    field_value = number_values[counter['numbers']]
-                    if isinstance(field_value, list):
-                        field_value = field_value[0]
-                    counter['numbers'] += 1
-                elif e['data_type'] == 'tags':
-                    field_value = tags_values[counter['tags']]
-                    counter['tags'] += 1
-                elif e['data_type'] == 'link':
-                    field_value = link_values[counter['links']]
-                    counter['links'] += 1
-
-                self.data[k]['value'] = field_value
+            self.read_values_store(values)
 
-            return str(np.random.rand())
+            return secrets.token_hex(8)
 
         @self.parent_app.callback(
             self.update_forms_values_callback_outputs,
             [
                 Input({'type': 'external-trigger-update-forms-values', 'index': ALL}, 'children'),
                 Input({'type': 'internal-trigger-update-forms-values', 'parent': self.id, 'index': ALL}, 'children')
-            ],
-            self.update_forms_values_callback_states
-
+            ]
         )
-        def update_forms_values(trigger, trigger_all, *states):
+        def update_forms_values(trigger, trigger_all):
+            # Outputs are matched by id: fields of subforms not rendered yet are not in the layout.
+            # Only fields changed on the server since the last update are sent.
             ctx = dash.callback_context
             trigger_source = ctx.triggered[0]['prop_id'].split('.')[0]
 
@@ -534,37 +535,24 @@ class SchemaFormContainer(html.Div):
             if context['type'] == 'internal-trigger-update-forms-values' and all((trg is None) or trg == [] or trg == '' for trg in trigger_all):
                 raise dash.exceptions.PreventUpdate
 
-            output_path = []
-            output_bool = []
-            output_string = []
-            output_date = []
-            output_tags = []
-            output_name = []
-            output_number = []
-
-            for v in self.data.values():
-                if v['compound_id']['data_type'] == 'path':
-                    output_path.append(v['value'])
-                elif v['compound_id']['data_type'] == 'boolean':
-                    output_bool.append(v['value'])
-                elif v['compound_id']['data_type'] == 'string':
-                    output_string.append(v['value'])
-                elif v['compound_id']['data_type'] == 'datetime':
-                    output_date.append(v['value'])
-                elif v['compound_id']['data_type'] == 'tags':
-                    tags_values = v['value'] if v['value'] is not None else []
-                    output_tags.append([{"index": i, "displayValue": e} for i, e in enumerate(tags_values)])
-                elif v['compound_id']['data_type'] == 'link':
-                    pass
-                elif v['compound_id']['data_type'] == 'name':
-                    output_name.append(v['value'])
-                elif v['compound_id']['data_type'] == 'number':
-                    output_number.append(v['value'])
-
+            data = self.data
+            dirty = self.dirty
             output = [
-                output_path, output_bool, output_string, output_date, output_tags,
-                output_name, output_number, 1
+                [
+                    self.field_value(o['id']['index'], o['property']) if o['id']['index'] in dirty else dash.no_update
+                    for o in outputs
+                ]
+                for outputs in ctx.outputs_list[:-1]
             ]
+            # Link options depend only on name fields
+            links_by_target = self.session_state()['links_by_target']
+            names_changed = any(
+                data[k]['compound_id']['data_type'] == 'name' and links_by_target.get(data[k]['owner_class'])
+                for k in dirty
+            )
+            output.append(1 if names_changed else dash.no_update)
+            # Fields not rendered yet are built from data when their body is rendered
+            dirty.clear()
 
             return output
 
@@ -592,171 +580,731 @@ class SchemaFormContainer(html.Div):
             if trigger_source == f'{self.id}-trigger-update-links-values' and trigger is None:
                 raise dash.exceptions.PreventUpdate
 
-            i = 0
-            for k, v in self.data.items():
-                if v['compound_id']['data_type'] == 'name':
-                    self.data[k]['value'] = name_change[i]
-                    i += 1
-
-            # Get specific options for each link dropdown
+            session = self.session_state()
+            data = session['data']
+            stale = session['stale_classes']
+            for state in ctx.states_list[0]:
+                k = state['id']['index']
+                if data[k]['value'] != state.get('value'):
+                    data[k]['value'] = state.get('value')
+                    stale.add(data[k]['owner_class'])
+                    session['unvalidated'].add(k)
+                session['dirty'].discard(k)
+
+            # External triggers refresh all links, otherwise only links to classes whose names changed
+            refresh_all = trigger_source == 'external-trigger-update-links-values'
+            options_by_target = {}
             list_options = []
             list_values = []
-            for k, v in self.data.items():
-                if v['target'] is not None:
-                    target_class = v['target']
-                    options = [
-                        {'label': v['value'], 'value': v['value']}
-                        for v in self.data.values() if
-                        (v['owner_class'] == target_class and 'name' in v['compound_id']['index'])
-                    ]
-                    if len(options) > 0:
-                        list_values.append(options[0]['value'])
-                        list_options.append(options)
-                    else:
-                        list_values.append([])
-                        list_options.append([])
-
-            for sublist in list_options[:]:
-                for e in sublist[:]:
-                    if e['value'] is None:
-                        sublist.remove(e)
+            for o in ctx.outputs_list[0]:
+                target = data[o['id']['index']]['target']
+                if not refresh_all and target not in stale:
+                    list_values.append(dash.no_update)
+                    list_options.append(dash.no_update)
+                    continue
+                if target not in options_by_target:
+                    options_by_target[target] = self.link_options(target)
+                options = options_by_target[target]
+                list_values.append(options[0]['value'] if options else [])
+                list_options.append(options)
+            # Links not rendered yet get their options from data when rendered
+            stale.clear()
 
             output = [list_options, list_values, [1]]
 
             return output
 
-    def update_lists_data(self, v, key, k):
-        for i, e in enumerate(v):
-            for i_key, i_value in e.items():
-                if isinstance(i_value, list):
-                    inner_key = f'{key}-{k}-{i}'
-                    self.update_lists_data(i_value, inner_key, i_key)
-                else:
-                    component_id = f'{key}-{k}-{i}-{i_key}'
-                    self.data[component_id]['value'] = i_value
-        return
+        if self.lazy_subforms:
+            @self.parent_app.callback(
+                Output({'type': 'collapsible-content', 'container': self.id, 'index': MATCH}, 'children'),
+                [Input({'type': 'collapsible-toggle', 'container': self.id, 'index': MATCH}, 'n_clicks')],
+                [State({'type': 'collapsible-content', 'container': self.id, 'index': MATCH}, 'children')]
+            )
+            def render_form_body(n_clicks, children):
+                # Bodies are built once, on the first expand
+                if not n_clicks or children:
+                    raise dash.exceptions.PreventUpdate
+                return self.render_form_body(matched_index())
+
+        if metrics_route is not None:
+            self.metrics = init_metrics(self.parent_app.server, route=metrics_route)
+            self.register_metrics(set(self.parent_app.callback_map) - callbacks_before)
+
+    def register_metrics(self, outputs):
+        """Record the metrics of the server callbacks of outputs, if the container has metrics"""
+        if self.metrics is None:
+            return
+        for output in outputs:
+            callback = self.parent_app.callback_map[output]
+            # Clientside callbacks have no server function
+            if 'callback' in callback:
+                self.metrics.register(output, container=self.id, callback=callback['callback'].__name__)
+
+    def validation_rules(self):
+        """
+        Rules checked in the browser for each field, keyed by rule_key
+
+        Returns:
+            rules [dict]: maps keys to dicts with 'required', 'type', 'enum' and 'pattern'
+        """
+        rules = {}
+        for spec in iter_plan_fields(self.plan):
+            schema = spec.schema
+            rule = {}
+            if spec.required:
+                rule['required'] = True
+            if spec.data_type in ('string', 'name', 'number') and schema.get('type') in ('string', 'number'):
+                rule['type'] = schema['type']
+            if 'enum' in schema:
+                rule['enum'] = schema['enum']
+            elif isinstance(schema.get('items'), dict) and 'enum' in schema['items']:
+                rule['enum'] = schema['items']['enum']
+            if 'pattern' in schema:
+                rule['pattern'] = schema['pattern']
+            if rule:
+                rules[self.rule_key(self.field_id(spec.path))] = rule
+        return rules
+
+    def rule_key(self, index):
+        """Key of the rules of a field, shared by the entries of an array: digit parts of the id become '*'"""
+        parts = index[len(self.id) + 1:].split('-')
+        return '-'.join('*' if part.isdigit() else part for part in parts)
+
+    def register_clientside_validation(self):
+        """Register the clientside callback that checks the validation_rules in the browser"""
+        _args_dict = dict(type='metadata-input', container_id=f"{self.id}", index=ALL)
+        # Input components with an 'invalid' prop come first
+        invalid_types = ['path', 'string', 'number', 'name']
+        other_types = ['datetime', 'tags', 'link', 'choicestring']
+        outputs = [Output(dict(_args_dict, data_type=t), 'invalid') for t in invalid_types]
+        outputs.append(Output(f'{self.id}-validation-errors', 'data'))
+        if self.submit_button_id is not None:
+            outputs.append(Output(self.submit_button_id, 'disabled'))
+
+        # Rules are compiled into the function, so patterns are built once per page
+        self.parent_app.clientside_callback(
+            """
+            (function(rules, prefix, n_invalid, submit){
+                Object.values(rules).forEach(rule => {
+                    if (rule.pattern){ rule.regexp = new RegExp(rule.pattern) }
+                })
+                return function(){
+                    const ctx = dash_clientside.callback_context
+                    const errors = {}
+                    ctx.inputs_list.forEach(group => group.forEach(e => {
+                        const id = e.id.index
+                        const key = id.slice(prefix.length).split('-').map(s => /^\\d+$/.test(s) ? '*' : s).join('-')
+                        const rule = rules[key]
+                        if (!rule){ return }
+                        let v = e.value
+                        if (Array.isArray(v)){
+                            v = v.map(t => (t !== null && typeof t === 'object') ? t.displayValue : t)
+                        }
+                        const empty = v === null || typeof v === 'undefined' || (typeof v === 'string' && v.trim() === '') || (Array.isArray(v) && v.length === 0)
+                        let error = null
+                        if (empty){
+                            if (rule.required){ error = 'is required' }
+                        } else if (rule.type && typeof v !== rule.type){
+                            error = 'must be a ' + rule.type
+                        } else if (rule.enum && !(Array.isArray(v) ? v : [v]).every(x => rule.enum.includes(x))){
+                            error = 'must be one of ' + rule.enum.join(', ')
+                        } else if (rule.regexp && !rule.regexp.test(v)){
+                            error = 'must match ' + rule.pattern
+                        }
+                        if (error){ errors[id] = error }
+                    }))
+                    const output = ctx.inputs_list.slice(0, n_invalid).map(group => group.map(e => e.id.index in errors))
+                    output.push(errors)
+                    if (submit){ output.push(Object.keys(errors).length > 0) }
+                    return output
+                }
+            })(%s, %s, %d, %s)
+            """ % (
+                json.dumps(self.validation_rules()),
+                json.dumps(f'{self.id}-'),
+                len(invalid_types),
+                'true' if self.submit_button_id is not None else 'false'
+            ),
+            outputs,
+            [Input(dict(_args_dict, data_type=t), 'value') for t in invalid_types + other_types]
+        )
+
+    def get_filebrowser_modal(self, display):
+        """Return the file browser modal shared by all path fields of a display type, creating it on first use"""
+        if display not in self.filebrowser_modals:
+            self.filebrowser_modals[display] = make_filebrowser_modal(
+                parent_app=self.parent_app,
+                container_id=self.id,
+                display=display,
+                lazy=self.lazy_file_tree,
+                watch=self.watch_file_tree,
+                registry=self.file_browsers
+            )
+            # Internal trigger used to update the field that received the chosen path
+            self.children_triggers.append(html.Div(
+                id={'type': 'internal-trigger-update-forms-values', 'parent': self.id, 'index': display},
+                style={'display': 'none'}
+            ))
+        return self.filebrowser_modals[display]
+
+    def register_filebrowser_callbacks(self):
+        """Register the callbacks shared by the file browsers of all path fields, and those of new modals"""
+        if self.file_browsers and not self.filebrowser_displays:
+            register_filebrowser_callbacks(
+                parent_app=self.parent_app,
+                container_id=self.id,
+                registry=self.file_browsers,
+                lazy=self.lazy_file_tree,
+                watch=self.watch_file_tree
+            )
+        for display in self.filebrowser_modals:
+            if display not in self.filebrowser_displays:
+                self.register_filebrowser_modal_callback(display)
+                self.filebrowser_displays.add(display)
+
+    def register_filebrowser_modal_callback(self, display):
+        """Open the shared modal for the field that requested it and write the chosen path back to it"""
+
+        @self.parent_app.callback(
+            [
+                Output(filebrowser_id('modal', self.id, display), 'is_open'),
+                Output(filebrowser_id('target', self.id, display), 'data'),
+                Output({'type': 'internal-trigger-update-forms-values', 'parent': self.id, 'index': display}, 'children')
+            ],
+            [
+                Input({'type': 'filebrowser-open', 'container': self.id, 'display': display, 'index': ALL}, 'n_clicks'),
+                Input(filebrowser_id('close', self.id, display), 'n_clicks'),
+                Input(filebrowser_id('submit', self.id, display), 'n_clicks')
+            ],
+            [
+                State(filebrowser_id('chosen', self.id, display), 'value'),
+                State(filebrowser_id('target', self.id, display), 'data')
+            ]
+        )
+        def toggle_filebrowser(clicks_open, click_close, click_submit, chosen_path, target):
+            """
+            Toggle modal open/close. On submit, update Container data of the field
+            that opened the modal and trigger frontend components updates
+            """
+            ctx = dash.callback_context
+            if not ctx.triggered or not ctx.triggered[0]['value']:
+                raise dash.exceptions.PreventUpdate
+            trigger = triggered_id()
+            if trigger['type'] == 'filebrowser-open':
+                return True, trigger['index'], dash.no_update
+            if trigger['type'] == 'filebrowser-submit' and target is not None:
+                # Update Container internal dictionary value
+                self.set_field_value(target, chosen_path)
+                # Triggers components update
+                return False, dash.no_update, secrets.token_hex(8)
+            return False, dash.no_update, dash.no_update
+
+    def render_form_body(self, index):
+        """
+        Build the body of a subform that was sent collapsed and empty.
+
+        Args:
+            index [str]: index of the subform 'collapsible-content' component
+        Returns:
+            items [list]: children of the subform body, or dash.no_update for
+                subforms that were sent with their body, e.g. an empty one
+        """
+        if index not in self.lazy_forms:
+            return dash.no_update
+        spec, key = self.lazy_forms[index]
+        return SchemaForm(spec=spec, container=self, key=key).items
+
+    def array_control_id(self, component, index):
+        """Pattern-matching id of the items Div, entries count Store or Add/Remove buttons of an array of subforms"""
+        return {'type': f'array-{component}', 'container': self.id, 'index': index}
+
+    def register_array_callbacks(self):
+        """Register the callback of the Add/Remove buttons of all arrays of subforms, once"""
+        if not self.arrays or self.array_callbacks_registered:
+            return
+        self.array_callbacks_registered = True
+
+        @self.parent_app.callback(
+            [
+                Output(self.array_control_id('items', MATCH), 'children'),
+                Output(self.array_control_id('count', MATCH), 'data')
+            ],
+            [
+                Input(self.array_control_id('add', MATCH), 'n_clicks'),
+                Input(self.array_control_id('remove', MATCH), 'n_clicks')
+            ],
+            [State(self.array_control_id('count', MATCH), 'data')]
+        )
+        def update_array_items(n_add, n_remove, count):
+            # Children are rebuilt from the session's entries, so clicks sent
+            # before the previous response arrived do not desync them
+            ctx = dash.callback_context
+            array_id = matched_index()
+            if ctx.triggered and ctx.triggered[0]['value']:
+                try:
+                    if triggered_id()['type'] == 'array-add':
+                        self.add_array_item(array_id)
+                    else:
+                        self.remove_array_item(array_id)
+                except ValueError:
+                    raise dash.exceptions.PreventUpdate
+                count = None
+            # Otherwise the initial call, when the page or the body holding the array is loaded
+            children = self.array_children(array_id, count)
+            if children is dash.no_update:
+                raise dash.exceptions.PreventUpdate
+            return children, len(children)
+
+    def array_children(self, array_id, count=None):
+        """
+        Children of the items Div of an array of subforms for the entries of
+        the current session. The layout is built with the entries the array
+        had then, and is sent again as is when the page is reloaded, while the
+        session keeps the entries added and removed since.
+
+        Args:
+            array_id [str]: id of the array field
+            count [int | None]: number of entries in the layout, None if unknown
+        Returns:
+            children [list]: or dash.no_update if the layout has the entries of the session
+        """
+        length = self.session_state()['array_lengths'].get(array_id)
+        if length is None or length == count:
+            return dash.no_update
+        return [self.array_item_form(array_id, i) for i in range(length)]
+
+    def array_item_form(self, array_id, position):
+        """SchemaForm of an entry of an array of subforms, showing its current values"""
+        array = self.arrays[array_id]
+        item_spec = self.array_items[array_id][position]
+        return SchemaForm(
+            spec=item_spec,
+            container=self,
+            key=f'{array.name}-{item_spec.name}',
+            render_body=not self.lazy_subforms
+        )
+
+    def register_arrays(self, specs):
+        """Record the arrays of subforms under compiled forms, with their current number of entries"""
+        lengths = self.session_state()['array_lengths']
+        for spec in specs:
+            for array in iter_arrays(spec):
+                array_id = self.field_id(array.path)
+                with self._arrays_lock:
+                    self.arrays[array_id] = array
+                    self.array_items.setdefault(array_id, list(array.items))
+                lengths[array_id] = len(array.items)
+
+    def add_array_item(self, array_id):
+        """
+        Append one entry to an array of subforms.
+
+        Only the fields of the new entry are compiled and added to data.
+        Compiled entries are shared by all sessions.
+
+        Args:
+            array_id [str]: id of the array field, e.g. 'form-NWBFile-Electrodes'
+        Returns:
+            form [SchemaForm]: subform of the new entry
+        """
+        array = self.arrays[array_id]
+        lengths = self.session_state()['array_lengths']
+        length = lengths[array_id]
+        if array.max_items is not None and length >= array.max_items:
+            raise ValueError(f"'{array_id}' already has maxItems={array.max_items} entries")
+        with self._arrays_lock:
+            items = self.array_items[array_id]
+            if length == len(items):
+                items.append(compile_array_item(self.plan, array, length))
+            item_spec = items[length]
+        lengths[array_id] = length + 1
+        self.register_fields(iter_fields(item_spec))
+        self.register_arrays([item_spec])
+        self.form_data.register_paths([item_spec])
+        return self.array_item_form(array_id, length)
+
+    def remove_array_item(self, array_id):
+        """
+        Remove the last entry of an array of subforms and its fields from data.
+
+        Args:
+            array_id [str]: id of the array field, e.g. 'form-NWBFile-Electrodes'
+        Returns:
+            item_spec [FormSpec]: compiled form of the removed entry
+        """
+        array = self.arrays[array_id]
+        lengths = self.session_state()['array_lengths']
+        length = lengths[array_id]
+        if length <= array.min_items:
+            raise ValueError(f"'{array_id}' requires at least minItems={array.min_items} entries")
+        item_spec = self.array_items[array_id][length - 1]
+        lengths[array_id] = length - 1
+        self._unregister(item_spec)
+        return item_spec
+
+    def _unregister(self, spec):
+        if isinstance(spec, FieldSpec):
+            self.form_data.unregister_field(self.session_state(), self.field_id(spec.path))
+        elif isinstance(spec, FormSpec):
+            for child in spec.children:
+                self._unregister(child)
+        elif isinstance(spec, ArraySpec):
+            array_id = self.field_id(spec.path)
+            length = self.session_state()['array_lengths'].pop(array_id, 0)
+            for item in self.array_items.get(array_id, [])[:length]:
+                self._unregister(item)
 
     def update_data(self, data, key=None):
-        """Update data in the internal mapping dictionary of this Container"""
-        if key is None:
-            key = self.id
-    
-        # Update dict with incoming data
-        for k, v in data.items():
-            if k in self.skiped_forms:
-                continue
-            # If value is a dictionary
-            if isinstance(v, dict):
-                if key != '':
-                    inner_key = f'{key}-{k}'
-                else:
-                    inner_key = k
-                self.update_data(data=v, key=inner_key)
-            # If value is a list of dicts
-            elif isinstance(v, list) and len(v) > 0 and isinstance(v[0], dict):
-                self.update_lists_data(v, key, k)
-            # If no value on list of dicts
-            elif isinstance(v, list) and len(v) == 0:
+        """
+        Update data in the internal mapping dictionary of this Container
+
+        Args:
+            data [dict]: nested metadata (data format)
+            key [str | None]: deprecated, id of the form data belongs to, e.g.
+                f'{container.id}-NWBFile'; pass data from the root instead
+        Returns:
+            report [PrefillReport]: see prefill
+        """
+        if key is not None:
+            warnings.warn(
+                'The key argument of update_data is deprecated, pass data from the root of the container',
+                DeprecationWarning,
+                stacklevel=2
+            )
+            if key != self.id:
+                if not key.startswith(self.id + '-'):
+                    raise ValueError(f"'{key}' is not a form of container '{self.id}'")
+                for name in reversed(key[len(self.id) + 1:].split('-')):
+                    data = {name: data}
+        return self.prefill(data)
+
+    def prefill(self, metadata):
+        """
+        Set the values of all fields present in nested metadata, in one pass.
+
+        Keys are looked up by their path in the compiled schema. Keys that do
+        not match the container are collected in the report instead of
+        interrupting the load.
+
+        Args:
+            metadata [dict]: nested metadata (data format)
+        Returns:
+            report [PrefillReport]
+        """
+        return self.form_data.prefill(self.session_state(), metadata)
+
+    def prefill_json(self, fp):
+        """
+        Like prefill, reading the metadata from a JSON file object. With the
+        optional ijson package the file is parsed incrementally.
+        """
+        return self.form_data.prefill_json(self.session_state(), fp)
+
+    @property
+    def data(self):
+        """Fields of the current session, mapping field ids to their properties and value"""
+        return self.session_state()['data']
+
+    @data.setter
+    def data(self, data):
+        """Replace the fields of the current session, and send all of them on the next forms values update"""
+        self.form_data.replace_data(self.session_state(), data)
+
+    @property
+    def dirty(self):
+        """Ids of the fields of the current session changed since the last forms values update"""
+        return self.session_state()['dirty']
+
+    def session_state(self):
+        """State of the browser session of the current request, or the default state outside of requests"""
+        state = request_state(self.id, self.state_store, self._new_session_state)
+        if state is None:
+            return self.default_state
+        for key in ('dirty', 'stale_classes', 'unvalidated'):
+            if not isinstance(state[key], set):
+                state[key] = set(state[key])
+        return state
+
+    def _new_session_state(self):
+        return copy.deepcopy(self.default_state)
+
+    def field_id(self, path):
+        """Component id of the field or form at a path of the compiled schema"""
+        return self.form_data.field_id(path)
+
+    def compound_id(self, spec):
+        """Pattern-matching id of the input component of a compiled field"""
+        return self.form_data.compound_id(spec)
+
+    def register_fields(self, fields):
+        """Add compiled fields, with their default values, to the internal mapping dictionary"""
+        self.form_data.register_fields(self.session_state(), fields)
+
+    def submit_states(self):
+        """
+        States to add to an app callback that reads the form data in a single
+        request, see states_to_nested.
+
+        Returns:
+            states [list]: list of dash.dependencies.State
+        """
+        return [State(f'{self.id}-values-store', 'data')]
+
+    def states_to_nested(self, *states):
+        """
+        Apply the values of the States from submit_states to data and convert
+        them to nested dict (data format)
+
+        Args:
+            states: values of the States returned by submit_states, in order
+        Returns:
+            alert_children [list | None]: Alerts children if required fields empty or None if no required fields empty
+            output [dict]: Output dict w/ data
+        """
+        values, = states
+        self.read_values_store(values)
+        return self.data_to_nested()
+
+    def read_values_store(self, values):
+        """
+        Apply the values collected in the browser to data.
+
+        Args:
+            values [dict]: data of the id + '-values-store' Store, mapping field ids to component values
+        """
+        session = self.session_state()
+        data = session['data']
+        dirty = session['dirty']
+        stale = session['stale_classes']
+        unvalidated = session['unvalidated']
+        for k, value in (values or {}).items():
+            # Entries of arrays removed since the Store was written
+            if k not in data:
                 continue
-            # If value is a string, number, list of strings or boolean
-            else:
-                component_id = key + '-' + k  # e.g. NWBFile-session_description
-                self.data[component_id]['value'] = v
+            value = self.client_value(data[k]['compound_id']['data_type'], value)
+            if data[k]['value'] != value:
+                if data[k]['compound_id']['data_type'] == 'name':
+                    stale.add(data[k]['owner_class'])
+                unvalidated.add(k)
+            data[k]['value'] = value
+            dirty.discard(k)
+
+    def client_value(self, data_type, value):
+        """Convert the value of an input component to the value stored in data"""
+        if data_type == 'path':
+            return str(self.root_path / (value if value is not None else ''))
+        if data_type == 'number' and isinstance(value, list):
+            return value[0]
+        if data_type == 'tags' and value is not None:
+            return [e['displayValue'] if isinstance(e, dict) else e for e in value]
+        return value
+
+    def set_field_value(self, index, value):
+        """Set the value of a field and mark it to be sent on the next forms values update"""
+        self.form_data.set_field_value(self.session_state(), index, value)
+
+    def mark_dirty(self, indexes=None):
+        """
+        Mark fields whose values were changed directly in data, so the next
+        forms values update sends them.
+
+        Args:
+            indexes [iterable | None]: field ids, all fields if None
+        """
+        self.form_data.mark_dirty(self.session_state(), indexes)
+
+    def field_props(self, spec):
+        """Props of the input component of a field that show its current value"""
+        value = self.data[self.field_id(spec.path)]['value']
+        data_type = spec.data_type
+        if data_type == 'link':
+            return {'options': self.link_options(spec.target), 'value': '' if value is None else value}
+        if data_type == 'choicestring':
+            return {'value': value}
+        if data_type == 'boolean':
+            return {'checked': value}
+        if value is None:
+            return {}
+        if data_type == 'datetime':
+            return {'defaultValue': value}
+        if data_type == 'tags':
+            return {'injectedTags': self.field_value(self.field_id(spec.path), 'injectedTags')}
+        return {'value': value}
+
+    def field_value(self, index, prop):
+        """Value of a field in the format of a prop of its input component"""
+        value = self.data[index]['value']
+        if prop == 'injectedTags':
+            tags_values = value if value is not None else []
+            return [{"index": i, "displayValue": e} for i, e in enumerate(tags_values)]
+        return value
+
+    def link_options(self, target):
+        """Dropdown options of a link field: the names of the objects of the target class"""
+        session = self.session_state()
+        data = session['data']
+        return [
+            {'label': data[k]['value'], 'value': data[k]['value']}
+            for k in session['names_by_class'].get(target, [])
+            if data[k]['value'] is not None
+        ]
+
+    def layout_cache_key(self):
+        """Key of this container's layout in layout_cache"""
+        return self.plan.schema_hash, self.id, self.lazy_subforms, self.compact
 
     def construct_children_forms(self):
-        # Construct children forms
-        if 'properties' in self.schema:
-            for form_key, form_value in self.schema['properties'].items():
-                if "renderForm" in form_value and not form_value['renderForm']:
-                    self.skiped_forms.extend(form_key)
-                    continue
+        # Construct children forms of the current schema, plans are cached by schema hash
+        callbacks_before = set(self.parent_app.callback_map)
+        self.plan = compile_schema(self.schema)
+        self.form_data.plan = self.plan
+        self.skiped_forms = list(self.plan.skipped)
+        # Modals are created up front, path fields of lazy subforms and new array entries are rendered later
+        for display in path_formats(self.plan):
+            self.get_filebrowser_modal(display=display)
+        self.register_arrays(self.plan.forms)
+        self.form_data.register_paths(self.plan.forms)
+        cached = self.layout_cache.get(self.layout_cache_key()) if self.cache_layout else None
+        if cached is not None:
+            children_forms, data, lazy_forms = cached
+            self.data.update(copy.deepcopy(data))
+            for index, entry in self.data.items():
+                self.form_data.index_field(self.default_state, index, entry)
+            self.default_state['unvalidated'].update(self.data)
+            self.children_forms = list(children_forms)
+            self.lazy_forms.update(lazy_forms)
+        else:
+            self.register_fields(self.plan.fields)
+            for form_spec in self.plan.forms:
                 iform = SchemaForm(
-                    schema=form_value,
-                    key=form_key,
+                    spec=form_spec,
                     container=self
                 )
-                if iform.skiped_forms:
-                    self.skiped_forms.extend(iform.skiped_forms)
                 self.children_forms.append(iform)
-        self.children = self.children_forms + self.children_triggers
+            if self.cache_layout:
+                self.layout_cache.put(
+                    self.layout_cache_key(),
+                    (serialize_component(self.children_forms), copy.deepcopy(self.data), dict(self.lazy_forms))
+                )
+        self.children = self.children_forms + list(self.filebrowser_modals.values()) + self.children_triggers
+        self.register_filebrowser_callbacks()
+        self.register_array_callbacks()
+
+        # Rules are compiled into the callback, which can only be registered once
+        if self.clientside_validation and not self.validation_registered:
+            self.register_clientside_validation()
+            self.validation_registered = True
+        self.register_metrics(set(self.parent_app.callback_map) - callbacks_before)
 
     def data_to_nested(self):
         """
         Read internal dict (containing ids, values, etc) and convert to nested
         dict (data format)
 
+        Values are placed by build_nested, in a single pass over the fields.
+        Errors come from validate, which re-checks only the fields changed
+        since the previous call.
+
         Returns:
-            alert_children [list | None]: Alerts children if required fields empty or None if no required fields empty
+            alert_children [list | None]: Alerts children if fields are empty or invalid or None if all fields are valid
             output [dict]: Output dict w/ data
         """
 
-        dicts_list = list()
-        output = dict()
-        empty_required_fields = list()
-        alert_children = [
-            html.H4("There are missing required fields:", className="alert-heading"),
-            html.Hr()
-        ]
+        output = build_nested(self.data)
+        return self.validation_alert(self.validate()), output
 
-        for k, v in self.data.items():
-            field_value = v['value']
-            if v['required'] and (field_value is None or (isinstance(field_value, str) and field_value.isspace()) or field_value == '' or (str(field_value) == str(self.root_path))):
-                empty_required_fields.append(k)
-                alert_children.append(html.A(
-                    k,
-                    href="#" + 'wrapper-' + v['compound_id']['index'] + '-' + v['compound_id']['type'],
-                    className="alert-link"
-                ))
-                alert_children.append(html.Hr())
-            if field_value not in ['', None]:
-                splited_keys = k.split('-')
-                master_key_name = splited_keys[0]
-                field_name = splited_keys[-1]
-
-                for element in reversed(splited_keys):
-                    if element == field_name:
-                        curr_dict = {field_name: v['value']}
-                    elif element != master_key_name:
-                        curr_dict = {element: curr_dict}
-                    else:
-                    #if element == master_key_name:
-                        dicts_list.append(curr_dict)
-
-        for e in dicts_list:
-            master_key_name = list(e.keys())[0]
-            output = SchemaFormContainer._create_nested_dict(
-                data=e,
-                output=output,
-                master_key_name=master_key_name
-            )
+    def validate(self):
+        """
+        Check the values of data against the constraints of the schema, see
+        FormData.validate.
+
+        Returns:
+            errors [list]: ValidationError of each failed constraint
+        """
+        return self.form_data.validate(self.session_state())
 
-        if len(empty_required_fields) > 0:
-            return alert_children, output
+    def field_anchor(self, index):
+        """Id of the Div wrapping the input component of a field"""
+        return self.form_data.field_anchor(index)
+
+    def validation_alert(self, errors):
+        """
+        Alert children listing errors with links to their fields
+
+        Args:
+            errors [list]: ValidationError items, see validate
+        Returns:
+            alert_children [list | None]: None if there are no errors
+        """
+        if not errors:
+            return None
+        if all(e.rule == 'required' for e in errors):
+            heading = "There are missing required fields:"
         else:
-            return None, output
-
-    @staticmethod
-    def _create_nested_dict(data, output, master_key_name):
-        for k, v in data.items():
-            if isinstance(v, dict):
-                if isinstance(output, list) or k not in output:
-                    if list(v.keys())[0].isdigit():
-                        output[k] = list()
-                    elif k.isdigit() and int(k) == len(output):
-                        output.append(dict())
-                    elif not k.isdigit():
-                        output[k] = dict()
-                    if isinstance(output, dict):
-                        SchemaFormContainer._create_nested_dict(v, output[k], master_key_name)
-                    elif isinstance(output, list):
-                        SchemaFormContainer._create_nested_dict(v, output[int(k)], master_key_name)
-                else:
-                    SchemaFormContainer._create_nested_dict(v, output[k], master_key_name)
-            else:
-                if isinstance(v, list):
-                    element = [e['displayValue'] for e in v]
-                else:
-                    element = v
-                output[k] = element
+            heading = "There are invalid fields:"
+        alert_children = [html.H4(heading, className="alert-heading"), html.Hr()]
+        for e in errors:
+            text = e.field if e.rule == 'required' else f'{e.field}: {e.message}'
+            alert_children.append(html.A(text, href="#" + e.anchor, className="alert-link"))
+            alert_children.append(html.Hr())
+        return alert_children
+
+    def is_missing(self, entry):
+        """Whether a field of data is required and has no value"""
+        return self.form_data.is_missing(entry)
+
+    def iter_json(self, indent=None, missing=None):
+        """
+        Yield the nested dict (data format) as chunks of JSON text, in schema
+        order, without building it in memory.
 
-        return output
+        Args:
+            indent [int | None]: as in json.dumps
+            missing [list | None]: receives the ids of required fields with no value
+        """
+        data = self.data
+        lengths = self.session_state()['array_lengths']
+        writer = JSONStreamWriter(indent=indent)
+
+        def walk(spec, index=None):
+            if isinstance(spec, FieldSpec):
+                k = self.field_id(spec.path)
+                v = data[k]
+                if missing is not None and self.is_missing(v):
+                    missing.append(k)
+                field_value = v['value']
+                if field_value not in ['', None]:
+                    if isinstance(field_value, list):
+                        field_value = [e['displayValue'] if isinstance(e, dict) else e for e in field_value]
+                    yield from writer.value(spec.name, field_value)
+            elif isinstance(spec, FormSpec):
+                yield from writer.open(key=None if index is not None else spec.name, index=index)
+                for child in spec.children:
+                    yield from walk(child)
+                yield from writer.close()
+            elif isinstance(spec, ArraySpec):
+                array_id = self.field_id(spec.path)
+                yield from writer.open(key=spec.name, kind='list')
+                for i, item in enumerate(self.array_items.get(array_id, [])[:lengths.get(array_id, 0)]):
+                    yield from walk(item, index=i)
+                yield from writer.close()
+
+        yield from writer.open()
+        for form_spec in self.plan.forms:
+            yield from walk(form_spec)
+        yield from writer.close()
+
+    def export_json(self, fp, indent=None):
+        """
+        Write the nested dict (data format) as JSON to a file-like object, in schema order
+
+        Args:
+            fp: file-like object open for writing text
+            indent [int | None]: as in json.dumps
+        Returns:
+            missing [list]: ids of required fields with no value
+        """
+        missing = []
+        for chunk in self.iter_json(indent=indent, missing=missing):
+            fp.write(chunk)
+        return missing
@@ -0,0 +1,142 @@
+import bisect
+import threading
+import time
+
+import flask
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class CallbackMetrics:
+    """
+    Count, latency histogram and request and response bytes of the callbacks
+    of the containers of a Flask server, in Prometheus text format.
+
+    Only callbacks registered with register are recorded, keyed by the output
+    id Dash sends with each request, which is also a label, so callbacks of
+    the same function registered for several outputs, e.g. the modal of each
+    file browser display, are separate series. Clientside callbacks run in
+    the browser and are not recorded.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS, route=None):
+        self.buckets = tuple(buckets)
+        self.route = route
+        self.labels = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, output, container, callback):
+        """
+        Args:
+            output [str]: output id of the callback, as in app.callback_map
+            container [str]: id of the container that registered it
+            callback [str]: name of the callback function
+        """
+        self.labels[output] = (container, callback, output)
+
+    def observe(self, output, seconds, request_bytes, response_bytes):
+        """Record one request of a registered callback, ignoring other outputs"""
+        labels = self.labels.get(output)
+        if labels is None:
+            return
+        with self._lock:
+            stats = self.stats.get(labels)
+            if stats is None:
+                stats = self.stats[labels] = {
+                    'count': 0, 'sum': 0.0, 'buckets': [0] * len(self.buckets),
+                    'request_bytes': 0, 'response_bytes': 0
+                }
+            stats['count'] += 1
+            stats['sum'] += seconds
+            bucket = bisect.bisect_left(self.buckets, seconds)
+            if bucket < len(self.buckets):
+                stats['buckets'][bucket] += 1
+            stats['request_bytes'] += request_bytes
+            stats['response_bytes'] += response_bytes
+
+    def render(self):
+        """Metrics in Prometheus text exposition format"""
+        with self._lock:
+            stats = {labels: dict(s, buckets=list(s['buckets'])) for labels, s in self.stats.items()}
+        lines = [
+            '# HELP schema_forms_callback_duration_seconds Latency of the container callbacks.',
+            '# TYPE schema_forms_callback_duration_seconds histogram',
+        ]
+        for labels, s in stats.items():
+            label = _labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, s['buckets']):
+                cumulative += count
+                lines.append(f'schema_forms_callback_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'schema_forms_callback_duration_seconds_bucket{{{label},le="+Inf"}} {s["count"]}')
+            lines.append(f'schema_forms_callback_duration_seconds_sum{{{label}}} {s["sum"]}')
+            lines.append(f'schema_forms_callback_duration_seconds_count{{{label}}} {s["count"]}')
+        for key, help_text in (
+            ('request_bytes', 'Bytes of the requests of the container callbacks.'),
+            ('response_bytes', 'Bytes of the responses of the container callbacks.'),
+        ):
+            lines.append(f'# HELP schema_forms_callback_{key}_total {help_text}')
+            lines.append(f'# TYPE schema_forms_callback_{key}_total counter')
+            for labels, s in stats.items():
+                lines.append(f'schema_forms_callback_{key}_total{{{_labels(labels)}}} {s[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    container, callback, output = (_escape(label) for label in labels)
+    return f'container="{container}",callback="{callback}",output="{output}"'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_metrics_lock = threading.Lock()
+
+
+def init_metrics(server, route='/metrics'):
+    """
+    Time the Dash callback requests of a Flask server and serve the metrics
+    of the registered callbacks on route. Registered once per server, with
+    one route: later calls must pass the same route.
+
+    Returns:
+        metrics [CallbackMetrics]: shared by all containers of the server
+    Raises:
+        ValueError: if the metrics of the server are served on another route
+    """
+    with _metrics_lock:
+        metrics = server.extensions.get('json_schema_to_dash_forms_metrics')
+        if metrics is not None:
+            if metrics.route != route:
+                raise ValueError(f"Metrics of this server are already served on '{metrics.route}', not '{route}'")
+            return metrics
+        metrics = server.extensions['json_schema_to_dash_forms_metrics'] = CallbackMetrics(route=route)
+
+    @server.before_request
+    def _start_timer():
+        if flask.request.path.endswith('/_dash-update-component'):
+            flask.g.schema_forms_callback_start = time.perf_counter()
+
+    @server.after_request
+    def _record_callback(response):
+        start = getattr(flask.g, 'schema_forms_callback_start', None)
+        if start is None:
+            return response
+        # Parsed and cached by Dash when the callback ran
+        body = flask.request.get_json(silent=True) or {}
+        metrics.observe(
+            output=body.get('output'),
+            seconds=time.perf_counter() - start,
+            request_bytes=flask.request.content_length or 0,
+            response_bytes=response.calculate_content_length() or 0
+        )
+        return response
+
+    server.add_url_rule(
+        route,
+        endpoint='json_schema_to_dash_forms_metrics',
+        view_func=lambda: flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    )
+    return metrics
@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class PrefillReport(namedtuple('PrefillReport', ['applied', 'unknown', 'invalid', 'skipped'])):
+    """
+    Outcome of loading metadata into a container.
+
+    Attributes:
+        applied [int]: number of field values set
+        unknown [list]: paths (tuples) of keys that match no field or form of the container
+        invalid [list]: paths whose value does not fit, e.g. a dict for a field or a string for a form
+        skipped [list]: paths of properties with renderForm = false
+    """
+    __slots__ = ()
+
+
+def iter_leaves(data):
+    """
+    Yield (path, value) for every value of nested metadata, in document order.
+
+    Lists of dicts (arrays of subforms) are walked with int positions in the
+    path; other lists are values, e.g. tags. Empty lists and dicts are left out.
+    """
+    if not isinstance(data, dict):
+        raise TypeError(f'Metadata must be a dict, got {type(data).__name__}')
+    return _walk((), data)
+
+
+def _walk(path, node):
+    stack = [(path, node)]
+    while stack:
+        path, node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend((path + (k,), v) for k, v in reversed(list(node.items())))
+        elif isinstance(node, list) and len(node) > 0 and all(isinstance(e, dict) for e in node):
+            stack.extend((path + (i,), node[i]) for i in reversed(range(len(node))))
+        elif not (isinstance(node, list) and len(node) == 0):
+            yield path, node
+
+
+def iter_json_leaves(fp):
+    """
+    Like iter_leaves, for a JSON document read incrementally from a file
+    object with ijson, so that large files are never loaded whole.
+
+    Objects are walked as they are read. Arrays are read whole before their
+    leaves are yielded, since whether they are values or arrays of subforms
+    depends on all of their elements.
+    """
+    if ijson is None:
+        raise ImportError('Streaming JSON files requires the ijson package')
+    # Keys of the objects open around the current event
+    keys = []
+    builder = None
+    depth = 0
+    for _, event, value in ijson.parse(fp, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+                if depth == 0:
+                    yield from _walk(tuple(keys), builder.value)
+                    builder = None
+        elif event == 'start_map':
+            keys.append(None)
+        elif event == 'map_key':
+            keys[-1] = value
+        elif event == 'end_map':
+            keys.pop()
+        elif not keys:
+            raise TypeError('Metadata must be a JSON object')
+        elif event == 'start_array':
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+        else:
+            yield tuple(keys), value
@@ -0,0 +1,132 @@
+import json
+import time
+import tracemalloc
+
+import dash_bootstrap_components as dbc
+import plotly
+
+from .schema_plan import iter_fields, ArraySpec
+
+
+def serialized_size(component):
+    """Bytes of a component tree as sent to the browser"""
+    return len(json.dumps(component, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def tooltips_size(component):
+    """Bytes of the tooltips in a component tree"""
+    return sum(serialized_size(c) for c in component._traverse() if isinstance(c, dbc.Tooltip))
+
+
+class ConstructionProfiler:
+    """
+    Time and serialized size of the parts of a container layout, recorded
+    while it is built, and with trace_memory=True the tracemalloc peak of the
+    whole build.
+
+    Tracing every allocation slows the build down several times, so timings
+    of a traced build are not comparable with untraced ones. Measure them in
+    separate builds, see benchmarks/profile_construction.py.
+
+    SchemaForm and SchemaFormItem report themselves to the profiler of their
+    container. Sizes are measured once the build is finished.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.forms = []
+        self.items = []
+        self.started = None
+        self.seconds = None
+        self.peak_bytes = None
+        self._tracing = False
+
+    def start(self):
+        if self.trace_memory:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self.started
+        if self.trace_memory:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+
+    def add_form(self, form, seconds):
+        """Record a SchemaForm and the time taken to build it, subforms included"""
+        self.forms.append((form, seconds))
+
+    def add_item(self, item, seconds):
+        """Record a SchemaFormItem and the time taken to build it, subforms of arrays excluded"""
+        self.items.append((item, seconds))
+
+    def report(self, container):
+        """
+        Returns:
+            report [dict]: with keys
+                seconds, bytes: of the whole build and layout
+                tracemalloc_peak_bytes: of the whole build, None if memory was not traced
+                memory_traced: whether the timings include the tracemalloc overhead
+                forms: maps form ids to the seconds, bytes and number of fields of their subtree
+                data_types: maps data types ('list' for arrays of subforms) to the count,
+                    seconds, bytes and tooltip_bytes of their items
+                filebrowser_modals: maps display types to the bytes of their shared modal
+        """
+        forms = {}
+        for form, seconds in self.forms:
+            forms[form.id] = {
+                'seconds': seconds,
+                'bytes': serialized_size(form),
+                'fields': sum(1 for _ in iter_fields(form.spec))
+            }
+        data_types = {}
+        for item, seconds in self.items:
+            data_type = 'list' if isinstance(item.spec, ArraySpec) else item.spec.data_type
+            stats = data_types.setdefault(data_type, {'count': 0, 'seconds': 0.0, 'bytes': 0, 'tooltip_bytes': 0})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            # Subforms of the entries of arrays are counted in forms
+            stats['bytes'] += serialized_size(item) - sum(serialized_size(f) for f in item.subforms)
+            stats['tooltip_bytes'] += tooltips_size(item) - sum(tooltips_size(f) for f in item.subforms)
+        return {
+            'seconds': self.seconds,
+            'bytes': serialized_size(container),
+            'tracemalloc_peak_bytes': self.peak_bytes,
+            'memory_traced': self.trace_memory,
+            'forms': forms,
+            'data_types': data_types,
+            'filebrowser_modals': {
+                display: serialized_size(modal) for display, modal in container.filebrowser_modals.items()
+            }
+        }
+
+
+def format_report(report):
+    """Text table of a ConstructionProfiler report"""
+    if report['tracemalloc_peak_bytes'] is None:
+        memory = 'memory not traced'
+    else:
+        memory = f"tracemalloc peak {report['tracemalloc_peak_bytes'] / 1024 ** 2:.1f}MiB"
+    if report['memory_traced']:
+        memory += ', timings include the tracemalloc overhead'
+    lines = [
+        f"build {report['seconds'] * 1000:.1f}ms, layout {report['bytes'] / 1024:.1f}KiB, {memory}",
+        '',
+        f"{'data type':16} {'count':>7} {'ms':>9} {'KiB':>9} {'tooltip KiB':>12} {'B/item':>8}",
+    ]
+    for data_type, s in sorted(report['data_types'].items(), key=lambda e: -e[1]['bytes']):
+        lines.append(
+            f"{data_type:16} {s['count']:7} {s['seconds'] * 1000:9.1f} {s['bytes'] / 1024:9.1f} "
+            f"{s['tooltip_bytes'] / 1024:12.1f} {s['bytes'] // s['count']:8}"
+        )
+    for display, size in report['filebrowser_modals'].items():
+        lines.append(f"{'modal ' + display:16} {1:7} {'':>9} {size / 1024:9.1f}")
+    lines += ['', f"{'form':40} {'fields':>7} {'ms':>9} {'KiB':>9}"]
+    for form_id, s in sorted(report['forms'].items(), key=lambda e: -e[1]['bytes']):
+        lines.append(f"{form_id:40} {s['fields']:7} {s['seconds'] * 1000:9.1f} {s['bytes'] / 1024:9.1f}")
+    return '\n'.join(lines)
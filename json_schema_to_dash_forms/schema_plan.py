@@ -0,0 +1,373 @@
+import hashlib
+import json
+import warnings
+from collections import namedtuple
+
+from .cache import LRUCache
+
+
+class FieldSpec(namedtuple('FieldSpec', [
+    'name', 'path', 'pointer', 'data_type', 'default', 'required',
+    'target', 'owner_class', 'description', 'schema'
+])):
+    """
+    Compiled input field.
+
+    Attributes:
+        name [str]: property name in the schema
+        path [tuple]: keys from the root of the data to this field, e.g. ('NWBFile', 'session_description'),
+            with int positions for entries of arrays, e.g. ('NWBFile', 'Electrodes', 0, 'name')
+        pointer [str]: JSON pointer to the field definition in the root schema
+        data_type [str]: component type, one of DATA_TYPES
+        default: initial value of the field
+        required [bool]: whether the field is required by its parent form
+        target [str | None]: owner class of the objects a link field points to
+        owner_class [str]: 'tag' of the form that owns the field
+        description [str]: tooltip text
+        schema [dict]: resolved schema of the field
+    """
+    __slots__ = ()
+
+
+class FormSpec(namedtuple('FormSpec', [
+    'name', 'path', 'pointer', 'title', 'owner_class', 'required', 'children', 'skipped', 'schema'
+])):
+    """
+    Compiled (sub)form.
+
+    Attributes:
+        children [tuple]: FieldSpec, FormSpec and ArraySpec items in schema order
+        skipped [tuple]: names of properties with renderForm = false
+    """
+    __slots__ = ()
+
+
+class ArraySpec(namedtuple('ArraySpec', [
+    'name', 'path', 'pointer', 'required', 'description', 'min_items', 'max_items', 'items',
+    'item_pointer', 'item_schema'
+])):
+    """
+    Compiled array of subforms.
+
+    Attributes:
+        items [tuple]: FormSpec of each of the min_items initial entries
+        item_pointer [str]: JSON pointer to the resolved schema of the entries
+        item_schema [dict]: resolved schema of the entries
+    """
+    __slots__ = ()
+
+
+class SchemaPlan(namedtuple('SchemaPlan', ['schema_hash', 'schema', 'forms', 'fields', 'skipped'])):
+    """
+    Flat, immutable description of everything a schema renders.
+
+    Attributes:
+        schema_hash [str]: content hash of the schema
+        forms [tuple]: FormSpec of each root property
+        fields [tuple]: every FieldSpec in schema (and layout) order
+        skipped [tuple]: names of properties with renderForm = false
+    """
+    __slots__ = ()
+
+
+DATA_TYPES = ('choicestring', 'link', 'tags', 'datetime', 'string', 'path', 'boolean', 'number', 'name')
+
+plan_cache = LRUCache(maxsize=32)
+
+
+def schema_hash(schema):
+    """Content hash of a schema, independent of key order"""
+    serialized = json.dumps(schema, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+def compile_schema(schema):
+    """
+    Compile a schema into a SchemaPlan, memoized by content hash.
+
+    Args:
+        schema [dict]: JSON schema
+    Returns:
+        plan [SchemaPlan]
+    """
+    key = schema_hash(schema)
+    plan = plan_cache.get(key)
+    if plan is None:
+        plan = _SchemaCompiler(schema, key).compile()
+        plan_cache.put(key, plan)
+    return plan
+
+
+def compile_array_item(plan, array, index):
+    """Compile the FormSpec of entry number index of an array of subforms"""
+    compiler = _SchemaCompiler(plan.schema, plan.schema_hash)
+    return compiler.compile_form(
+        schema=array.item_schema,
+        name=str(index),
+        path=array.path + (index,),
+        pointer=array.item_pointer
+    )
+
+
+def iter_fields(spec):
+    """Yield every FieldSpec under a FormSpec or ArraySpec, in schema order"""
+    if isinstance(spec, FieldSpec):
+        yield spec
+    elif isinstance(spec, FormSpec):
+        for child in spec.children:
+            yield from iter_fields(child)
+    elif isinstance(spec, ArraySpec):
+        for item in spec.items:
+            yield from iter_fields(item)
+
+
+def iter_arrays(spec):
+    """Yield every ArraySpec under a FormSpec or ArraySpec, in schema order"""
+    if isinstance(spec, FormSpec):
+        for child in spec.children:
+            yield from iter_arrays(child)
+    elif isinstance(spec, ArraySpec):
+        yield spec
+        for item in spec.items:
+            yield from iter_arrays(item)
+
+
+def iter_plan_fields(plan):
+    """
+    Yield every FieldSpec the plan can render, including the fields of the
+    first entry of arrays of subforms that start with no entries. Entries of
+    the same array (and of arrays sharing their item schema) have the same
+    field definitions, so only one of them is compiled.
+    """
+    seen_items = set()
+
+    def visit(spec):
+        if isinstance(spec, FieldSpec):
+            yield spec
+        elif isinstance(spec, FormSpec):
+            for child in spec.children:
+                yield from visit(child)
+        elif isinstance(spec, ArraySpec):
+            for item in spec.items:
+                yield from visit(item)
+            if not spec.items and spec.item_pointer not in seen_items:
+                seen_items.add(spec.item_pointer)
+                yield from visit(compile_array_item(plan, spec, 0))
+
+    for form in plan.forms:
+        yield from visit(form)
+
+
+def path_formats(plan):
+    """
+    Formats ('file', 'directory') of every path field the plan can render,
+    including fields of array entries that are only added later.
+    """
+    formats = []
+    for spec in iter_plan_fields(plan):
+        if spec.data_type == 'path' and spec.schema['format'] not in formats:
+            formats.append(spec.schema['format'])
+    return formats
+
+
+def resolve_ref(schema, ref):
+    """
+    Resolve a local JSON reference, e.g. '#/definitions/Device'
+
+    Returns:
+        tuple (pointer [str], resolved [dict])
+    """
+    if not ref.startswith('#'):
+        raise ValueError(f"Only local references are supported, got '{ref}'")
+    resolved = schema
+    pointer = ref[1:]
+    for part in pointer.split('/')[1:]:
+        part = part.replace('~1', '/').replace('~0', '~')
+        if isinstance(resolved, list):
+            resolved = resolved[int(part)]
+        else:
+            resolved = resolved[part]
+    return pointer, resolved
+
+
+def _escape(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+class _SchemaCompiler:
+    def __init__(self, schema, key):
+        self.schema = schema
+        self.key = key
+        self._refs = []
+
+    def compile(self):
+        forms = []
+        skipped = []
+        for form_key, form_value in self.schema.get('properties', dict()).items():
+            if "renderForm" in form_value and not form_value['renderForm']:
+                skipped.append(form_key)
+                continue
+            pointer = '/properties/' + _escape(form_key)
+            pointer, form_value = self._deref(pointer, form_value)
+            form = self.compile_form(schema=form_value, name=form_key, path=(form_key,), pointer=pointer)
+            skipped.extend(self._skipped(form))
+            forms.append(form)
+
+        fields = tuple(f for form in forms for f in iter_fields(form))
+        return SchemaPlan(
+            schema_hash=self.key,
+            schema=self.schema,
+            forms=tuple(forms),
+            fields=fields,
+            skipped=tuple(skipped)
+        )
+
+    def _skipped(self, form):
+        skipped = list(form.skipped)
+        for child in form.children:
+            if isinstance(child, FormSpec):
+                skipped.extend(self._skipped(child))
+            elif isinstance(child, ArraySpec):
+                for item in child.items:
+                    skipped.extend(self._skipped(item))
+        return skipped
+
+    def _deref(self, pointer, value):
+        if '$ref' in value:
+            ref = value['$ref']
+            if ref in self._refs:
+                raise ValueError(f"Recursive reference '{ref}' at '{pointer}' is not supported")
+            return resolve_ref(self.schema, ref)
+        return pointer, value
+
+    def compile_form(self, schema, name, path, pointer):
+        """Compile a (sub)form and all of its properties"""
+        required_fields = schema.get('required', [])
+        owner_class = str(schema.get('tag', ''))
+        children = []
+        skipped = []
+
+        for k, v in schema.get('properties', dict()).items():
+            required = k in required_fields
+            child_path = path + (k,)
+            child_pointer = f'{pointer}/properties/{_escape(k)}'
+
+            if 'renderForm' in v and not v['renderForm']:
+                skipped.append(k)
+                continue
+
+            # If item is an object or reference to an object on definitions, make subform
+            if 'type' in v and v['type'] == 'object':
+                children.append(self.compile_form(schema=v, name=k, path=child_path, pointer=child_pointer))
+                continue
+            elif "$ref" in v:
+                ref = v['$ref']
+                ref_pointer, ref_schema = self._deref(child_pointer, v)
+                self._refs.append(ref)
+                try:
+                    children.append(self.compile_form(schema=ref_schema, name=k, path=child_path, pointer=ref_pointer))
+                finally:
+                    self._refs.pop()
+                continue
+
+            # If item is an array
+            if 'type' in v and (v['type'] == 'array'):
+                # v['type'] == array requires also v['items'] definition
+                if v.get('items') is None:
+                    warnings.warn(f"Schema badly defined for field '{k}'. Array fields require definition of 'type'. Skipping it...")
+                    continue
+
+                # If item is an array of subforms, it should have 'minItems'
+                if 'minItems' in v:
+                    children.append(self._compile_array(v, k, child_path, child_pointer, required))
+                    continue
+
+            # If item is something not yet implemented
+            elif not ('type' in v and v['type'] in ['string', 'number', 'boolean']):
+                warnings.warn(f'Field input not yet implemented for {k}. Skipping it...')
+                continue
+
+            children.append(self._compile_field(v, k, child_path, child_pointer, required, owner_class))
+
+        return FormSpec(
+            name=name,
+            path=path,
+            pointer=pointer,
+            title=schema.get('title', name),
+            owner_class=owner_class,
+            required=tuple(required_fields),
+            children=tuple(children),
+            skipped=tuple(skipped),
+            schema=schema
+        )
+
+    def _compile_array(self, v, k, path, pointer, required):
+        items = v['items']
+        item_pointer = pointer + '/items'
+        # Tuple validation form, all entries share the first schema
+        if isinstance(items, list):
+            items = items[0]
+            item_pointer += '/0'
+        ref = items.get('$ref')
+        item_pointer, item_schema = self._deref(item_pointer, items)
+        if ref is not None:
+            self._refs.append(ref)
+        try:
+            forms = tuple(
+                self.compile_form(schema=item_schema, name=str(index), path=path + (index,), pointer=item_pointer)
+                for index in range(v['minItems'])
+            )
+        finally:
+            if ref is not None:
+                self._refs.pop()
+        return ArraySpec(
+            name=k,
+            path=path,
+            pointer=pointer,
+            required=required,
+            description=v.get('description', ''),
+            min_items=v['minItems'],
+            max_items=v.get('maxItems'),
+            items=forms,
+            item_pointer=item_pointer,
+            item_schema=item_schema
+        )
+
+    @staticmethod
+    def _compile_field(v, k, path, pointer, required, owner_class):
+        default = None
+        if 'enum' in v:
+            data_type = 'choicestring'
+            default = v.get('default', '')
+        elif 'target' in v:
+            data_type = 'link'
+        elif v.get('type') == 'array':
+            data_type = 'tags'
+        elif v.get('format') == 'date-time':
+            data_type = 'datetime'
+        elif v.get('format') == 'long':
+            data_type = 'string'
+        elif v.get('format') in ['file', 'directory']:
+            data_type = 'path'
+        elif v['type'] == 'boolean':
+            data_type = 'boolean'
+            default = v.get('default', False)
+        elif v['type'] == 'number':
+            data_type = 'number'
+        elif 'name' in k:
+            data_type = 'name'
+        else:
+            data_type = 'string'
+
+        return FieldSpec(
+            name=k,
+            path=path,
+            pointer=pointer,
+            data_type=data_type,
+            default=default,
+            required=required,
+            target=v.get('target', None),
+            owner_class=owner_class,
+            description=v.get('description', ''),
+            schema=v
+        )
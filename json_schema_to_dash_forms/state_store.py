@@ -0,0 +1,296 @@
+import json
+import secrets
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+
+import flask
+
+from .cache import LRUCache
+
+SESSION_COOKIE = 'schema_forms_session'
+
+
+class StateStore(ABC):
+    """
+    Backend that keeps the form state of each browser session.
+
+    A state is a dict that can be serialized to JSON, except for sets, which
+    backends may return as lists. Subclass it to keep states elsewhere, e.g. in
+    a shared cache for apps served by several processes. Subclasses that do
+    not implement load, save and delete cannot be instantiated.
+
+    A request holds the lock of a state, see acquire, from its load until
+    it is saved when the request ends, so that concurrent requests of the
+    same session do not overwrite each other's changes.
+    """
+
+    # Seconds a request waits for the state of its session before failing
+    lock_timeout = 30
+
+    def acquire(self, key):
+        """
+        Wait until no other request of this process holds the state of key,
+        and hold it until release. Stores shared by several processes
+        extend it with a lock they share.
+        """
+        _key_locks.acquire((id(self), key), timeout=self.lock_timeout)
+
+    def release(self, key):
+        """Release the state of key, held with acquire"""
+        _key_locks.release((id(self), key))
+
+    @abstractmethod
+    def load(self, key):
+        """Return the state saved under key, or None"""
+
+    @abstractmethod
+    def save(self, key, state):
+        """Save state under key, replacing the previous one"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Delete the state saved under key, if any"""
+
+
+class MemoryStateStore(StateStore):
+    """
+    In-process store holding the states of the maxsize most recently active
+    sessions. States of evicted sessions start over from the defaults.
+
+    States are kept as is and changed in place, so requests of the same
+    session are serialized by the lock of the state.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.states = LRUCache(maxsize=maxsize)
+
+    def load(self, key):
+        return self.states.get(key)
+
+    def save(self, key, state):
+        self.states.put(key, state)
+
+    def delete(self, key):
+        self.states.pop(key)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Store backed by an SQLite file, shared by all processes of the app.
+
+    The lock of a state is a row of the locks table, so it is shared by all
+    processes. A lock older than lock_ttl seconds, e.g. left by a process
+    that died, is taken over. States that a request did not change are not
+    written again.
+
+    Args:
+        path [str]: path of the database file, created if needed
+        max_age [float | None]: seconds after which states of inactive sessions are deleted
+    """
+
+    lock_ttl = 60
+
+    def __init__(self, path, max_age=None):
+        self.path = str(path)
+        self.max_age = max_age
+        # Serialized states as loaded, and tokens of the locks held, by key
+        self._loaded = {}
+        self._tokens = {}
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS states (key TEXT PRIMARY KEY, state TEXT, updated REAL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT, expires REAL)'
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def acquire(self, key):
+        # Threads of this process wait on the in-process lock, not on the table
+        super().acquire(key)
+        token = secrets.token_hex(8)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            now = time.time()
+            with self._connect() as connection:
+                connection.execute('DELETE FROM locks WHERE key = ? AND expires < ?', (key, now))
+                try:
+                    connection.execute(
+                        'INSERT INTO locks (key, token, expires) VALUES (?, ?, ?)',
+                        (key, token, now + self.lock_ttl)
+                    )
+                except sqlite3.IntegrityError:
+                    pass
+                else:
+                    self._tokens[key] = token
+                    return
+            if time.monotonic() > deadline:
+                super().release(key)
+                raise TimeoutError(f"State '{key}' is locked by another process")
+            time.sleep(0.01)
+
+    def release(self, key):
+        self._loaded.pop(key, None)
+        token = self._tokens.pop(key, None)
+        try:
+            if token is not None:
+                with self._connect() as connection:
+                    connection.execute('DELETE FROM locks WHERE key = ? AND token = ?', (key, token))
+        finally:
+            super().release(key)
+
+    def load(self, key):
+        with self._connect() as connection:
+            row = connection.execute('SELECT state FROM states WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._loaded[key] = row[0]
+        return json.loads(row[0])
+
+    def save(self, key, state):
+        serialized = json.dumps(state, default=_encode)
+        unchanged = self._loaded.pop(key, None) == serialized
+        if unchanged and self.max_age is None:
+            return
+        now = time.time()
+        with self._connect() as connection:
+            if unchanged:
+                # Only keep the session from expiring
+                connection.execute('UPDATE states SET updated = ? WHERE key = ?', (now, key))
+                return
+            connection.execute(
+                'INSERT OR REPLACE INTO states (key, state, updated) VALUES (?, ?, ?)',
+                (key, serialized, now)
+            )
+            if self.max_age is not None:
+                connection.execute('DELETE FROM states WHERE updated < ?', (now - self.max_age,))
+
+    def delete(self, key):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM states WHERE key = ?', (key,))
+
+
+def _encode(obj):
+    if isinstance(obj, (set, frozenset)):
+        # Sorted, so that an unchanged state serializes to the same text
+        try:
+            return sorted(obj)
+        except TypeError:
+            return list(obj)
+    if isinstance(obj, tuple):
+        return list(obj)
+    return str(obj)
+
+
+class _KeyLocks:
+    """Locks created per key on first use, and dropped once no thread holds or waits for them"""
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def acquire(self, key, timeout=None):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        if not entry[0].acquire(timeout=-1 if timeout is None else timeout):
+            self._drop(key)
+            raise TimeoutError(f"State '{key[1]}' is held by another request")
+
+    def release(self, key):
+        lock = self._locks[key][0]
+        self._drop(key)
+        lock.release()
+
+    def _drop(self, key):
+        with self._guard:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+_key_locks = _KeyLocks()
+
+
+_sessions_lock = threading.Lock()
+
+
+def init_sessions(server):
+    """
+    Identify browser sessions of a Flask server with a cookie and save the
+    states loaded during each request when it ends, then release their
+    locks. Registered once per server.
+    """
+    with _sessions_lock:
+        if server.extensions.get('json_schema_to_dash_forms_sessions'):
+            return
+        server.extensions['json_schema_to_dash_forms_sessions'] = True
+
+    @server.before_request
+    def _load_session():
+        flask.g.schema_forms_session = flask.request.cookies.get(SESSION_COOKIE)
+        flask.g.schema_forms_new_session = flask.g.schema_forms_session is None
+        if flask.g.schema_forms_new_session:
+            flask.g.schema_forms_session = secrets.token_hex(16)
+        flask.g.schema_forms_states = {}
+
+    @server.after_request
+    def _save_session(response):
+        for store, key, state in getattr(flask.g, 'schema_forms_states', {}).values():
+            store.save(key, state)
+        if getattr(flask.g, 'schema_forms_new_session', False):
+            response.set_cookie(SESSION_COOKIE, flask.g.schema_forms_session, httponly=True, samesite='Lax')
+        return response
+
+    @server.teardown_request
+    def _release_session(exception):
+        # Also runs when the request failed before its states were saved
+        states = getattr(flask.g, 'schema_forms_states', {})
+        while states:
+            _, (store, key, _) = states.popitem()
+            store.release(key)
+
+
+def session_id():
+    """Id of the browser session of the current request, None outside requests"""
+    if not flask.has_request_context():
+        return None
+    return getattr(flask.g, 'schema_forms_session', None)
+
+
+def request_state(owner, store, default):
+    """
+    Return the state of owner for the session of the current request.
+
+    The state is loaded from store once per request, or copied from default for
+    new sessions, and saved back to store when the request ends. The request
+    holds the lock of the state in between, see StateStore.acquire.
+
+    Args:
+        owner [str]: id of the component the state belongs to
+        store [StateStore]: backend holding the states
+        default [callable]: returns the state of a new session
+    Returns:
+        state [dict | None]: None outside of a request with a session
+    """
+    sid = session_id()
+    if sid is None:
+        return None
+    states = flask.g.schema_forms_states
+    if owner not in states:
+        key = f'{owner}:{sid}'
+        store.acquire(key)
+        try:
+            state = store.load(key)
+            if state is None:
+                state = default()
+        except Exception:
+            store.release(key)
+            raise
+        states[owner] = (store, key, state)
+    return states[owner][2]
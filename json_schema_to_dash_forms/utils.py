@@ -1,21 +1,59 @@
-import os
-from datetime import datetime
+import json
 
 import dash
 import dash_bootstrap_components as dbc
+import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, MATCH
 from dash_cool_components import KeyedFileBrowser
 from pathlib import Path
 
+from .directory_index import get_directory_index
 
-def make_filebrowser_modal(parent_app, modal_id="modal-filebrowser", display=None):
-    """File Explorer Example"""
+
+def filebrowser_id(component, container_id, index):
+    """Pattern-matching id of one of the components of a file browser"""
+    return {'type': f'filebrowser-{component}', 'container': container_id, 'index': index}
+
+
+def triggered_id():
+    """Return the id (dict for pattern-matching ids) of the component that triggered the callback"""
+    prop_id = dash.callback_context.triggered[0]['prop_id'].rsplit('.', 1)[0]
+    if prop_id.startswith('{'):
+        return json.loads(prop_id)
+    return prop_id
+
+
+def matched_index():
+    """Return the index matched by the MATCH outputs of the running callback"""
+    outputs = dash.callback_context.outputs_list
+    if isinstance(outputs, list):
+        outputs = outputs[0]
+    return outputs['id']['index']
+
+
+def make_filebrowser_modal(parent_app, container_id, display=None, lazy=False, watch=False, registry=None):
+    """
+    File Explorer Example
+
+    A single modal per container and display type is shared by all path fields.
+    The 'target' store records the index of the field that opened it.
+
+    Args:
+        registry [dict | None]: mapping of display to FileBrowserComponent, read by the
+            callbacks registered with register_filebrowser_callbacks
+    """
+    index = display or 'file'
     explorer = FileBrowserComponent(
         parent_app=parent_app,
-        id_suffix=modal_id,
-        display=display
+        container_id=container_id,
+        index=index,
+        display=display,
+        lazy=lazy,
+        watch=watch
     )
+    if registry is not None:
+        registry[index] = explorer
 
     modal = dbc.Container(
         dbc.Row(
@@ -24,30 +62,191 @@ def make_filebrowser_modal(parent_app, modal_id="modal-filebrowser", display=Non
                     [
                         dbc.ModalBody(explorer),
                         dbc.ModalFooter(
-                            dbc.Button("Close", id=modal_id + "-close", color='dark', className="ml-auto")
+                            dbc.Button(
+                                "Close",
+                                id=filebrowser_id('close', container_id, index),
+                                color='dark',
+                                className="ml-auto"
+                            )
                         ),
                     ],
-                    id=modal_id,
+                    id=filebrowser_id('modal', container_id, index),
                     size="xl"
                 ),
+                dcc.Store(id=filebrowser_id('target', container_id, index))
             ], style={'justify-content': 'center'}
         )
     )
     return modal
 
 
+def register_filebrowser_callbacks(parent_app, container_id, registry, lazy=False, watch=False):
+    """
+    Register the callbacks of all file browsers of a container.
+
+    Callbacks use MATCH on the browser index, so their number does not depend on
+    how many path fields the schema has. Opening, closing and submitting the
+    modal is handled by the container, which owns the field values.
+
+    Args:
+        registry [dict]: mapping of index to FileBrowserComponent
+    """
+    _register_browser_callbacks(
+        parent_app=parent_app,
+        make_id=lambda component: filebrowser_id(component, container_id, MATCH),
+        get_browser=lambda: registry[matched_index()],
+        lazy=lazy,
+        watch=watch
+    )
+
+
+def _register_browser_callbacks(parent_app, make_id, get_browser, lazy, watch):
+    """
+    Args:
+        make_id [callable]: returns the id of a component of the browser, e.g. make_id('tree')
+        get_browser [callable]: returns the FileBrowserComponent of the running callback
+    """
+
+    def triggered_by(component):
+        trigger = triggered_id()
+        if isinstance(trigger, dict):
+            return trigger['type'] == f'filebrowser-{component}'
+        return trigger == make_id(component)
+
+    @parent_app.callback(
+        [
+            Output(make_id('collapse'), "is_open"),
+            Output(make_id('chosen'), 'value')
+        ],
+        [
+            Input(make_id('choose'), "n_clicks"),
+            Input(make_id('tree'), 'selectedPath')
+        ],
+        [State(make_id('collapse'), "is_open")],
+    )
+    def toggle_collapse(n, path, is_open):
+        if path is None:
+            path = ''
+        if triggered_by('choose'):
+            return not is_open, path
+        return is_open, path
+
+    if watch:
+        @parent_app.callback(
+            Output(make_id('tree-diff'), 'data'),
+            [
+                Input(make_id('trigger-update-tree'), 'children'),
+                Input(make_id('watch-interval'), 'n_intervals')
+            ],
+            [State(make_id('tree-diff'), 'data')]
+        )
+        def update_tree_diff(trigger, n_intervals, diff):
+            # Send only the entries added and removed since the client's generation
+            return get_browser().tree_diff(diff=diff, reset=not triggered_by('watch-interval'))
+
+        parent_app.clientside_callback(
+            """
+            function(diff, files){
+                if (!diff || (!diff.reset && !diff.added)){
+                    return dash_clientside.no_update
+                }
+                if (diff.reset){
+                    return diff.reset
+                }
+                const removed = new Set(diff.removed)
+                return (files || []).filter(e => !removed.has(e.key)).concat(diff.added)
+            }
+            """,
+            Output(make_id('tree'), 'files'),
+            [Input(make_id('tree-diff'), 'data')],
+            [State(make_id('tree'), 'files')]
+        )
+    elif lazy:
+        @parent_app.callback(
+            Output(make_id('tree'), 'files'),
+            [
+                Input(make_id('trigger-update-tree'), 'children'),
+                Input(make_id('tree'), 'selectedPath')
+            ],
+            [State(make_id('tree'), 'files')]
+        )
+        def update_files_tree(trigger, path, files):
+            # Selecting a directory loads its children, refresh resets to the top level
+            browser = get_browser()
+            if triggered_by('tree'):
+                return browser.expand_dir(files=files, key=path)
+            browser.make_dict_from_dir(browser.display)
+            return browser.paths_tree
+    else:
+        @parent_app.callback(
+            Output(make_id('tree'), 'files'),
+            [Input(make_id('trigger-update-tree'), 'children')]
+        )
+        def update_files_tree(trigger):
+            # This function updates file browser tree when refresh
+            browser = get_browser()
+            browser.make_dict_from_dir(browser.display)
+            return browser.paths_tree
+
+
+# Ids of the components of a standalone browser, as before container registries
+_STANDALONE_IDS = {
+    'choose': 'button_file_browser_{}',
+    'chosen': 'chosen-filebrowser-{}',
+    'submit': 'submit-filebrowser-{}',
+    'collapse': 'collapse_file_browser_{}',
+    'trigger-update-tree': 'trigger_update_tree_{}',
+    'tree': 'keyedfilebrowser-{}',
+}
+
+
 class FileBrowserComponent(html.Div):
-    def __init__(self, parent_app, id_suffix, root_dir=None, display=None):
+    """
+    File browser over the DATA_PATH tree.
+
+    Browsers of a container are created with container_id and index, and
+    their callbacks are shared by all browsers of the container, see
+    register_filebrowser_callbacks. A standalone browser is created with
+    id_suffix instead, registers its own callbacks and keeps the component
+    ids it had before, e.g. 'submit-filebrowser-' + id_suffix.
+
+    With lazy=True only the top level of the tree is sent at first, and the
+    children of a directory are fetched from the server when it is selected.
+
+    With watch=True a background watcher keeps the shared directory index
+    current, and the browser polls it for the entries added and removed since
+    its last update, which are merged into the tree on the client.
+    Watching applies to the full tree only; lazy trees re-read each directory
+    when it is selected.
+    """
+
+    def __init__(self, parent_app, id_suffix=None, root_dir=None, display=None, container_id=None, index=None,
+                 lazy=False, watch=False):
         super().__init__([])
+        if container_id is None and id_suffix is None:
+            raise ValueError('FileBrowserComponent requires id_suffix, or container_id and index')
         self.parent_app = parent_app
         self.id_suffix = id_suffix
+        self.container_id = container_id
+        self.index_id = index
         self.display = display
+        self.lazy = lazy
+        self.watch = watch and not lazy
 
         if root_dir is None:
             self.root_dir = parent_app.server.config.get('DATA_PATH', Path.cwd())
         else:
             self.root_dir = root_dir
 
+        self.index = get_directory_index(
+            root_dir=self.root_dir,
+            ttl=self.parent_app.server.config.get('DATA_PATH_INDEX_TTL')
+        )
+        if self.watch:
+            self.index.start_watcher(
+                interval=self.parent_app.server.config.get('DATA_PATH_WATCH_INTERVAL', 2)
+            )
+
         self.make_dict_from_dir(display=self.display)
 
         button_text = 'Choose file'
@@ -57,12 +256,12 @@ class FileBrowserComponent(html.Div):
         # Button part
         input_group = dbc.InputGroup([
             dbc.InputGroupAddon(
-                dbc.Button(button_text, color='dark', id="button_file_browser_" + id_suffix),
+                dbc.Button(button_text, color='dark', id=self._id('choose')),
                 addon_type="prepend",
             ),
-            dbc.Input(id="chosen-filebrowser-" + id_suffix, placeholder=""),
+            dbc.Input(id=self._id('chosen'), placeholder=""),
             dbc.InputGroupAddon(
-                dbc.Button('Submit', color='dark', id='submit-filebrowser-' + id_suffix),
+                dbc.Button('Submit', color='dark', id=self._id('submit')),
                 addon_type='prepend',
             ),
         ])
@@ -77,43 +276,34 @@ class FileBrowserComponent(html.Div):
                     dbc.Card(dbc.CardBody(
                         self.container
                     )),
-                    id="collapse_file_browser_" + id_suffix,
+                    id=self._id('collapse'),
                 ),
-                html.Div(id=f'trigger_update_tree_{self.id_suffix}', style={'display': 'none'})
+                html.Div(id=self._id('trigger-update-tree'), style={'display': 'none'})
             ])
         ]
 
-        @self.parent_app.callback(
-            Output(f'keyedfilebrowser-{self.id_suffix}', 'files'),
-            [Input(f'trigger_update_tree_{self.id_suffix}', 'children')]
-        )
-        def update_files_tree(trigger):
-            # This function updates file browser tree when refresh
-            self.make_dict_from_dir(self.display)
-            return self.paths_tree
-
-
-        @self.parent_app.callback(
-            [
-                Output("collapse_file_browser_" + id_suffix, "is_open"),
-                Output("chosen-filebrowser-" + id_suffix, 'value')
-            ],
-            [
-                Input("button_file_browser_" + id_suffix, "n_clicks"),
-                Input('keyedfilebrowser-' + id_suffix, 'selectedPath')
-            ],
-            [State("collapse_file_browser_" + id_suffix, "is_open")],
-        )
-        def toggle_collapse(n, path, is_open):
+        if self.watch:
+            self.children.extend([
+                dcc.Interval(
+                    id=self._id('watch-interval'),
+                    interval=self.parent_app.server.config.get('DATA_PATH_WATCH_INTERVAL', 2) * 1000
+                ),
+                dcc.Store(id=self._id('tree-diff'), data={'generation': self.generation})
+            ])
 
-            ctx = dash.callback_context
-            trigger_source = ctx.triggered[0]['prop_id'].split('.')[0]
+        if self.container_id is None:
+            _register_browser_callbacks(
+                parent_app=self.parent_app,
+                make_id=self._id,
+                get_browser=lambda: self,
+                lazy=self.lazy,
+                watch=self.watch
+            )
 
-            if path is None:
-                path = ''
-            if trigger_source == f'button_file_browser_{self.id_suffix}':
-                return not is_open, path
-            return is_open, path
+    def _id(self, component):
+        if self.container_id is None:
+            return _STANDALONE_IDS.get(component, component + '-filebrowser-{}').format(self.id_suffix)
+        return filebrowser_id(component, self.container_id, self.index_id)
 
     def make_file_browser(self):
         dir_schema = self.paths_tree
@@ -121,7 +311,7 @@ class FileBrowserComponent(html.Div):
             dbc.Row(
                 dbc.Col(
                     KeyedFileBrowser(
-                        id='keyedfilebrowser-' + self.id_suffix,
+                        id=self._id('tree'),
                         files=dir_schema
                     ),
                 ),
@@ -133,56 +323,38 @@ class FileBrowserComponent(html.Div):
         return explorer
 
     def make_dict_from_dir(self, display):
+        """Read the file tree from the index shared by all browsers on this root"""
+        if self.lazy:
+            self.paths_tree = self.index.top_level(display=display)
+        else:
+            # Generation of the index the tree was read at, for tree_diff
+            self.generation, self.paths_tree = self.index.snapshot(display=display)
+
+    def expand_dir(self, files, key):
+        """Add the children of directory key to files, if they are not loaded yet"""
+        if not key or not key.endswith('/'):
+            return dash.no_update
+        files = files or []
+        known_keys = {e['key'] for e in files}
+        try:
+            children = self.index.list_dir(key, display=self.display)
+        except ValueError:
+            return dash.no_update
+        new_entries = [e for e in children if e['key'] not in known_keys]
+        if not new_entries:
+            return dash.no_update
+        return files + new_entries
 
-        keys_list = []
-        paths_list = []
-        for path, dirs, files in os.walk(self.root_dir):
-            curr_path = path + '/'
-
-            if curr_path.startswith('/'):
-                curr_path = curr_path[1:]
-            if curr_path not in paths_list:
-                paths_list.append(curr_path)
-            if len(files) > 0 and display != 'directory':
-                for file in files:
-                    aux_dict = {}
-                    file_path = Path(path) / file
-
-                    mod_datetime = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    delta = datetime.utcnow() - mod_datetime
-                    size = os.path.getsize(file_path)
-
-                    aux_dict['key'] = str(file_path).replace("\\", "/")
-                    aux_dict['modified'] = delta.days
-                    aux_dict['size'] = size
-
-                    keys_list.append(aux_dict)
-
-        for path in paths_list:
-            aux_dict = dict()
-            aux_dict['key'] = str(path).replace("\\", '/')
-            aux_dict['modified'] = None
-            aux_dict['size'] = 0
-            keys_list.append(aux_dict)
-
-        # Simplify file explorer to start on the base path defined on config
-        splitter = Path(self.root_dir).parent.name
-        if str(Path(self.root_dir).parent) == '.':
-            splitter = '.'
-
-        if splitter:
-            for e in keys_list:
-                splits = e['key'].split(splitter, maxsplit=1)
-                if len(splits) > 1:
-                    splitted = splits[1]
-                else:
-                    splitted = splits[0]
-                if splitted.startswith('/'):
-                    splitted = splitted[1:]
-                    e['key'] = splitted
-                elif splitted.startswith('.'):
-                    splitted = splitted[2:]
-                    e['key'] = splitted
-
-        self.paths_tree = keys_list
-        #print(self.paths_tree)
+    def tree_diff(self, diff, reset=False):
+        """Return the entries added and removed since the generation in diff, or a full reset"""
+        generation = (diff or {}).get('generation', -1)
+        changes = None
+        if not reset:
+            changes = self.index.changes_since(generation, display=self.display)
+        if changes is None:
+            self.make_dict_from_dir(self.display)
+            return {'generation': self.generation, 'reset': self.paths_tree}
+        generation, added, removed = changes
+        if not added and not removed:
+            return dash.no_update
+        return {'generation': generation, 'added': added, 'removed': removed}
@@ -0,0 +1,135 @@
+import re
+from collections import namedtuple
+
+from .cache import LRUCache
+
+
+class ValidationError(namedtuple('ValidationError', ['field', 'path', 'rule', 'message', 'anchor'])):
+    """
+    Constraint of the schema not met by the value of a field.
+
+    Attributes:
+        field [str]: field id, e.g. 'myform-NWBFile-session_description'
+        path [tuple]: path of the field in the nested data
+        rule [str]: schema keyword that failed, e.g. 'required', 'enum', 'minimum'
+        message [str]: description of the error
+        anchor [str]: id of the 'wrapper-...' Div of the field, for links to it
+    """
+    __slots__ = ()
+
+
+JSON_TYPES = {
+    'string': (str,),
+    'number': (int, float),
+    'integer': (int,),
+    'boolean': (bool,),
+    'array': (list,),
+}
+
+validator_cache = LRUCache(maxsize=4096)
+
+
+def field_validator(plan, spec):
+    """
+    Return the FieldValidator of a compiled field, shared by all fields with
+    the same definition, e.g. the same field of every entry of an array.
+
+    Args:
+        plan [SchemaPlan]: compiled schema the field belongs to
+        spec [FieldSpec]: compiled field
+    Returns:
+        validator [FieldValidator]
+    """
+    key = (plan.schema_hash, spec.pointer)
+    validator = validator_cache.get(key)
+    if validator is None:
+        validator = FieldValidator(spec.schema)
+        validator_cache.put(key, validator)
+    return validator
+
+
+class FieldValidator:
+    """
+    Checks of the constraints of a field schema, compiled once.
+
+    Supported keywords: type, enum, minimum, maximum, exclusiveMinimum,
+    exclusiveMaximum, minLength, maxLength, pattern, and minItems, maxItems
+    and items.enum for tags. Empty values are not checked, the required
+    rule is checked by the container.
+    """
+
+    def __init__(self, schema):
+        self.checks = tuple(self.compile(schema))
+
+    def validate(self, value):
+        """
+        Args:
+            value: value of the field in data
+        Returns:
+            errors [list]: (rule, message) of each failed check
+        """
+        if value is None or value == '' or value == []:
+            return []
+        errors = []
+        for rule, check, message in self.checks:
+            try:
+                valid = check(value)
+            except TypeError:
+                valid = False
+            if not valid:
+                errors.append((rule, message))
+                # Further checks assume the type is right
+                if rule == 'type':
+                    break
+        return errors
+
+    @staticmethod
+    def compile(schema):
+        """Yield (rule, check, message) for each constraint of schema, the type first"""
+        types = schema.get('type')
+        if isinstance(types, str) and types in JSON_TYPES:
+            allowed = JSON_TYPES[types]
+            if types in ('number', 'integer'):
+                yield 'type', lambda v: isinstance(v, allowed) and not isinstance(v, bool), f'must be a {types}'
+            else:
+                yield 'type', lambda v: isinstance(v, allowed), f'must be a{"n" if types == "array" else ""} {types}'
+
+        if 'enum' in schema:
+            yield 'enum', _bound(lambda v, b: v in b, schema['enum']), \
+                'must be one of ' + ', '.join(map(str, schema['enum']))
+
+        bounds = [
+            ('minimum', lambda v, b: v >= b, 'must be at least {}'),
+            ('maximum', lambda v, b: v <= b, 'must be at most {}'),
+            ('exclusiveMinimum', lambda v, b: v > b, 'must be greater than {}'),
+            ('exclusiveMaximum', lambda v, b: v < b, 'must be less than {}'),
+        ]
+        for rule, compare, message in bounds:
+            # Draft 4 boolean exclusive bounds are covered by minimum and maximum
+            if isinstance(schema.get(rule), (int, float)) and not isinstance(schema[rule], bool):
+                yield rule, _bound(compare, schema[rule]), message.format(schema[rule])
+
+        if 'minLength' in schema:
+            yield 'minLength', _bound(lambda v, b: len(v) >= b, schema['minLength']), \
+                f'must have at least {schema["minLength"]} characters'
+        if 'maxLength' in schema:
+            yield 'maxLength', _bound(lambda v, b: len(v) <= b, schema['maxLength']), \
+                f'must have at most {schema["maxLength"]} characters'
+        if 'pattern' in schema:
+            yield 'pattern', _bound(lambda v, b: b(v) is not None, re.compile(schema['pattern']).search), \
+                f'must match {schema["pattern"]}'
+
+        if 'minItems' in schema:
+            yield 'minItems', _bound(lambda v, b: len(v) >= b, schema['minItems']), \
+                f'must have at least {schema["minItems"]} items'
+        if 'maxItems' in schema:
+            yield 'maxItems', _bound(lambda v, b: len(v) <= b, schema['maxItems']), \
+                f'must have at most {schema["maxItems"]} items'
+        items = schema.get('items')
+        if isinstance(items, dict) and 'enum' in items:
+            yield 'enum', _bound(lambda v, b: all(e in b for e in v), items['enum']), \
+                'items must be one of ' + ', '.join(map(str, items['enum']))
+
+
+def _bound(compare, bound):
+    return lambda v: compare(v, bound)
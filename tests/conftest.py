@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def load_data(name):
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def schema():
+    return load_data('schema.json')
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    """DATA_PATH of the file browsers, with one file"""
+    root = tmp_path / 'data'
+    root.mkdir()
+    (root / 'a.txt').write_text('a')
+    return root
+
+
+@pytest.fixture
+def make_container(data_path):
+    """Build a SchemaFormContainer, with its Dash app, for a schema"""
+    import dash
+    from json_schema_to_dash_forms import SchemaFormContainer
+
+    def make(schema, **kwargs):
+        app = dash.Dash(__name__)
+        container = SchemaFormContainer(id='f', schema=schema, parent_app=app, root_path=str(data_path), **kwargs)
+        app.layout = container
+        return app, container
+
+    return make
@@ -0,0 +1,72 @@
+import json
+
+from json_schema_to_dash_forms.state_store import SESSION_COOKIE
+
+ARRAY = 'f-form_1-Sub-kids'
+
+
+def control_id(component):
+    return {'type': f'array-{component}', 'container': 'f', 'index': ARRAY}
+
+
+def prop_id(component, prop):
+    return json.dumps(control_id(component), sort_keys=True, separators=(',', ':')) + '.' + prop
+
+
+def click(app, button, count, session=None):
+    """Click the Add or Remove button of the array with count entries shown, returning the response and session id"""
+    key = next(k for k in app.callback_map if 'array-items' in k)
+    client = app.server.test_client(use_cookies=False)
+    response = client.post(
+        '/_dash-update-component',
+        json={
+            'output': key,
+            'outputs': [
+                {'id': control_id('items'), 'property': 'children'},
+                {'id': control_id('count'), 'property': 'data'}
+            ],
+            'inputs': [
+                {'id': control_id('add'), 'property': 'n_clicks', 'value': 1},
+                {'id': control_id('remove'), 'property': 'n_clicks', 'value': 1}
+            ],
+            'state': [{'id': control_id('count'), 'property': 'data', 'value': count}],
+            'changedPropIds': [prop_id(button, 'n_clicks')]
+        },
+        headers={'Cookie': f'{SESSION_COOKIE}={session}'} if session else {}
+    )
+    for header in response.headers.getlist('Set-Cookie'):
+        if header.startswith(SESSION_COOKIE + '='):
+            session = header.split(';')[0].split('=', 1)[1]
+    if response.status_code == 204:
+        return None, session
+    assert response.status_code == 200, response.get_data(as_text=True)
+    outputs = response.get_json()['response']
+    key = json.dumps(control_id('items'), sort_keys=True, separators=(',', ':'))
+    children = outputs[key]['children']
+    assert outputs[json.dumps(control_id('count'), sort_keys=True, separators=(',', ':'))]['data'] == len(children)
+    return children, session
+
+
+def entry_ids(children):
+    return [c['props']['id'] for c in children]
+
+
+def test_clicks_with_stale_count(schema, make_container):
+    app, container = make_container(schema)
+    children, session = click(app, 'add', 2)
+    assert len(children) == 3
+    # Sent before the first response arrived, with the same count
+    children, session = click(app, 'add', 2, session)
+    ids = entry_ids(children)
+    assert len(set(ids)) == 4
+    assert entry_ids(click(app, 'add', 4, session)[0])[:4] == ids
+
+    children, session = click(app, 'remove', 5, session)
+    assert len(children) == 4
+    children, session = click(app, 'remove', 5, session)
+    assert len(children) == 3
+
+
+def test_remove_stops_at_min_items(schema, make_container):
+    app, container = make_container(schema)
+    assert click(app, 'remove', 2)[0] is None
@@ -0,0 +1,86 @@
+import pytest
+
+from json_schema_to_dash_forms.directory_index import DirectoryIndex
+
+
+@pytest.fixture
+def index(data_path):
+    return DirectoryIndex(str(data_path))
+
+
+def keys(entries):
+    return sorted(e['key'] for e in entries)
+
+
+def test_snapshot(index, data_path):
+    generation, entries = index.snapshot()
+    assert generation == 1
+    assert keys(entries) == ['data/', 'data/a.txt']
+    (data_path / 'sub').mkdir()
+    assert keys(index.snapshot(display='directory')[1]) == ['data/', 'data/sub/']
+    assert index.snapshot()[0] == 2
+
+
+def test_changes_since(index, data_path):
+    generation, _ = index.snapshot()
+    assert index.changes_since(generation) == (generation, [], [])
+
+    (data_path / 'b.txt').write_text('b')
+    (data_path / 'a.txt').unlink()
+    index.apply_dir_changes([str(data_path)])
+    current, added, removed = index.changes_since(generation)
+    assert current == generation + 1 == index.generation
+    assert keys(added) == ['data/b.txt']
+    assert removed == ['data/a.txt']
+
+    (data_path / 'sub').mkdir()
+    (data_path / 'sub' / 'c.txt').write_text('c')
+    index.apply_dir_changes([str(data_path)])
+    current, added, removed = index.changes_since(generation)
+    assert current == generation + 2
+    assert keys(added) == ['data/b.txt', 'data/sub/', 'data/sub/c.txt']
+    assert removed == ['data/a.txt']
+    assert index.changes_since(generation, display='directory') == (current, [{'key': 'data/sub/', 'modified': None, 'size': 0}], [])
+    assert index.changes_since(current) == (current, [], [])
+
+
+def test_changes_since_needs_reload(index, data_path):
+    generation, _ = index.snapshot()
+    assert index.changes_since(generation + 1) is None
+    assert index.changes_since(generation - 1) is None
+    # A full rescan drops the recorded changes
+    (data_path / 'b.txt').write_text('b')
+    index.refresh(force=True)
+    assert index.changes_since(generation) is None
+
+
+def test_changes_since_limit(data_path):
+    index = DirectoryIndex(str(data_path), max_changes=2)
+    generation, _ = index.snapshot()
+    for name in ('b', 'c', 'd'):
+        (data_path / name).write_text(name)
+        index.apply_dir_changes([str(data_path)])
+    assert index.changes_since(generation) is None
+    assert keys(index.changes_since(generation + 1)[1]) == ['data/c', 'data/d']
+
+
+def test_symlinked_directories_not_expanded(index, data_path, tmp_path):
+    outside = tmp_path / 'outside'
+    outside.mkdir()
+    (outside / 'secret.txt').write_text('s')
+    try:
+        (data_path / 'link').symlink_to(outside, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip('symlinks are not supported')
+    # Listed as a directory by both the scan and the lazy listing, but never expanded
+    assert keys(index.entries()) == ['data/', 'data/a.txt', 'data/link/']
+    assert keys(index.top_level()) == ['data/', 'data/a.txt', 'data/link/']
+    assert index.list_dir('data/link/') == []
+
+
+def test_listings_cache_limit(data_path):
+    index = DirectoryIndex(str(data_path), max_listings=2)
+    for name in ('b', 'c', 'd'):
+        (data_path / name).mkdir()
+        index.list_dir(f'data/{name}/')
+    assert len(index._listings) == 2
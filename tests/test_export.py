@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from json_schema_to_dash_forms.export import JSONStreamWriter
+
+DOCUMENTS = [
+    {},
+    {'a': 1},
+    {'a': 'x', 'b': {'c': True, 'd': None, 'e': 1.5}, 'tags': ['t1', 't2']},
+    {'form': {'name': 'n', 'entries': [{'x': 1}, {'y': {'z': 'deep'}}, {'x': 3}]}},
+    {'unicode': 'é "quoted" \\ \n', 'nested': {'list': [[1, 2], {'k': 'v'}]}},
+    {'empty': {}, 'entries': [{}, {'x': 1}], 'only_empty': [{}, {}], 'sub': {'inner': {}}},
+]
+
+
+def write(writer, node, key=None, index=None):
+    """Chunks of the writer for a nested dict, walked as the container walks its plan"""
+    chunks = writer.open(key=key, index=index)
+    for k, v in node.items():
+        if isinstance(v, dict):
+            chunks += write(writer, v, key=k)
+        elif isinstance(v, list) and v and all(isinstance(e, dict) for e in v):
+            chunks += writer.open(key=k, kind='list')
+            for i, e in enumerate(v):
+                chunks += write(writer, e, index=i)
+            chunks += writer.close()
+        else:
+            chunks += writer.value(k, v)
+    return chunks + writer.close()
+
+
+def prune(node):
+    """node without empty objects and arrays, except entries of arrays followed by others"""
+    if isinstance(node, dict):
+        pruned = {k: prune(v) for k, v in node.items()}
+        return {k: v for k, v in pruned.items() if v != {} and v != []}
+    if isinstance(node, list) and node and all(isinstance(e, dict) for e in node):
+        pruned = [prune(e) for e in node]
+        while pruned and pruned[-1] == {}:
+            pruned.pop()
+        return pruned
+    return node
+
+
+@pytest.mark.parametrize('indent', [None, 2, 4])
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_stream_writer_matches_json_dumps(document, indent):
+    text = ''.join(write(JSONStreamWriter(indent=indent), document))
+    assert text == json.dumps(prune(document), indent=indent)
+
+
+@pytest.mark.parametrize('indent', [None, 4])
+def test_export_json_matches_data_to_nested(schema, make_container, indent):
+    _, container = make_container(schema)
+    container.prefill({
+        'form_1': {
+            'name': 'n1', 'num': 3, 'tags': ['a', 'b'],
+            'Sub': {'s': 'x', 'kids': [{'name': 'k0'}, {'x': 2}]}
+        },
+        'Device': {'name': 'dev1'}
+    })
+    fp = io.StringIO()
+    missing = container.export_json(fp, indent=indent)
+    _, nested = container.data_to_nested()
+    assert json.loads(fp.getvalue()) == nested
+    assert missing == ['f-form_1-file']
@@ -0,0 +1,14 @@
+import pytest
+
+SCHEMA = {'type': 'object', 'properties': {'form': {'type': 'object', 'properties': {'num': {'type': 'number'}}}}}
+
+
+def test_one_route_per_server(make_container):
+    from json_schema_to_dash_forms import SchemaFormContainer
+
+    app, container = make_container(SCHEMA, metrics_route='/metrics')
+    other = SchemaFormContainer(id='g', schema=SCHEMA, parent_app=app, metrics_route='/metrics')
+    assert other.metrics is container.metrics
+    with pytest.raises(ValueError):
+        SchemaFormContainer(id='h', schema=SCHEMA, parent_app=app, metrics_route='/other-metrics')
+    assert app.server.test_client().get('/metrics').mimetype == 'text/plain'
@@ -0,0 +1,74 @@
+import io
+import json
+
+import pytest
+
+from json_schema_to_dash_forms.prefill import iter_leaves, iter_json_leaves
+
+DOCUMENTS = [
+    {},
+    {'a': 1, 'b': 'x', 'c': None, 'd': True, 'f': 1.5},
+    {'form': {'name': 'n', 'tags': ['x', 'y'], 'empty_list': [], 'empty_dict': {}}},
+    {'entries': [{'n': 1}, {'n': 2, 'sub': [{'k': True}]}]},
+    {'mixed': [{'n': 1}, 2, 'x']},
+    {'mixed_first_value': [1, {'n': 1}]},
+    {'lists': [[1, 2], [3]], 'list_of_entries': [[{'a': 1}]]},
+    {'entries_then_list': [{'a': 1}, [1]], 'empty_entry': [{}]},
+    {'deep': {'x': {'y': [1, {'z': 2}], 'w': [{'v': [{'u': 'leaf'}]}]}}},
+]
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_json_leaves_match_leaves(document):
+    pytest.importorskip('ijson')
+    streamed = list(iter_json_leaves(io.BytesIO(json.dumps(document).encode())))
+    assert streamed == list(iter_leaves(document))
+
+
+def test_leaves_of_arrays():
+    document = {'entries': [{'n': 1}, {'n': 2}], 'tags': ['a'], 'mixed': [{'n': 1}, 2], 'empty': []}
+    assert list(iter_leaves(document)) == [
+        (('entries', 0, 'n'), 1),
+        (('entries', 1, 'n'), 2),
+        (('tags',), ['a']),
+        (('mixed',), [{'n': 1}, 2]),
+    ]
+
+
+def test_metadata_must_be_an_object():
+    pytest.importorskip('ijson')
+    with pytest.raises(TypeError):
+        list(iter_leaves([1]))
+    with pytest.raises(TypeError):
+        list(iter_json_leaves(io.BytesIO(b'[1]')))
+
+
+def test_prefill_json_matches_prefill(schema, make_container):
+    metadata = {
+        'form_1': {
+            'name': 'n1', 'bogus': 1, 'hidden': 'h', 'tags': ['a', 'b'],
+            'Sub': {'s': {'not': 'a value'}, 'kids': [{'name': 'k0'}, {'name': 'k1'}, {'name': 'k2'}]}
+        },
+        'Device': 'not a form'
+    }
+    _, container = make_container(schema)
+    report = container.prefill(metadata)
+    _, other = make_container(schema)
+    assert other.prefill_json(io.BytesIO(json.dumps(metadata).encode())) == report
+    assert report.applied == 4
+    assert report.unknown == [('form_1', 'bogus'), ('form_1', 'Sub', 'kids', 2)]
+    assert report.invalid == [('form_1', 'Sub', 's'), ('Device',)]
+    assert report.skipped == [('form_1', 'hidden')]
+
+
+def test_update_data_key_deprecated(schema, make_container):
+    _, container = make_container(schema)
+    with pytest.warns(DeprecationWarning):
+        report = container.update_data({'name': 'n1', 'Sub': {'s': 'x'}}, key='f-form_1')
+    assert report.applied == 2
+    form = container.data_to_nested()[1]['form_1']
+    assert (form['name'], form['Sub']['s']) == ('n1', 'x')
+    with pytest.warns(DeprecationWarning):
+        assert container.update_data({'form_1': {'name': 'n2'}}, key='f').applied == 1
+    with pytest.warns(DeprecationWarning), pytest.raises(ValueError):
+        container.update_data({'name': 'n3'}, key='g-form_1')
@@ -0,0 +1,71 @@
+import json
+
+import plotly
+
+from json_schema_to_dash_forms import FormData, compile_schema, new_state
+from json_schema_to_dash_forms.schema_plan import iter_plan_fields, plan_cache
+
+from conftest import load_data
+
+# Registry and input ids built by the container before compile_schema
+BASELINE = load_data('baseline_construction.json')
+REGISTRY_KEYS = ('compound_id', 'owner_class', 'target', 'value', 'required')
+
+
+def registry(data):
+    return {k: {key: v[key] for key in REGISTRY_KEYS} for k, v in data.items()}
+
+
+def layout_input_ids(container):
+    """Sorted ids of the field inputs in the serialized layout"""
+    ids = []
+    stack = [json.loads(json.dumps(container, cls=plotly.utils.PlotlyJSONEncoder))]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict) and 'props' in node:
+            component_id = node['props'].get('id')
+            if isinstance(component_id, dict) and component_id.get('type') == 'metadata-input':
+                ids.append(json.dumps(component_id, sort_keys=True))
+            stack.append(node['props'].get('children'))
+    return sorted(ids)
+
+
+def test_construction_matches_baseline(schema, make_container):
+    _, container = make_container(schema)
+    assert registry(container.data) == BASELINE['registry']
+    assert layout_input_ids(container) == sorted(json.dumps(i, sort_keys=True) for i in BASELINE['inputs'])
+
+
+def test_cached_layout_matches_baseline(schema, make_container):
+    make_container(schema, cache_layout=True)
+    _, container = make_container(schema, cache_layout=True)
+    assert registry(container.data) == BASELINE['registry']
+    assert layout_input_ids(container) == sorted(json.dumps(i, sort_keys=True) for i in BASELINE['inputs'])
+
+
+def test_plan_fields_match_registry(schema):
+    plan = compile_schema(schema)
+    ids = {'f-' + '-'.join(map(str, spec.path)) for spec in iter_plan_fields(plan)}
+    assert ids == set(BASELINE['registry'])
+    assert plan.skipped == ('hidden',)
+
+
+def test_compile_schema_is_cached_by_hash(schema):
+    plan_cache.clear()
+    plan = compile_schema(schema)
+    assert compile_schema(json.loads(json.dumps(schema))) is plan
+    changed = dict(schema, properties=dict(schema['properties'], Extra={'type': 'object', 'properties': {'x': {'type': 'string'}}}))
+    assert compile_schema(changed).schema_hash != plan.schema_hash
+
+
+def test_form_data_registry_matches_container(schema, make_container):
+    _, container = make_container(schema)
+    form_data = FormData('f', compile_schema(schema))
+    state = new_state()
+    form_data.register_plan(state)
+    assert registry(state['data']) == BASELINE['registry']
+    assert state['array_lengths'] == container.default_state['array_lengths']
+    assert state['names_by_class'] == container.default_state['names_by_class']
+    assert state['links_by_target'] == container.default_state['links_by_target']
@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from json_schema_to_dash_forms import MemoryStateStore, SQLiteStateStore, StateStore
+from json_schema_to_dash_forms.state_store import SESSION_COOKIE
+
+SCHEMA = {'type': 'object', 'properties': {'form': {'type': 'object', 'properties': {'num': {'type': 'number'}}}}}
+FIELD = 'f-form-num'
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStateStore()
+    return SQLiteStateStore(str(tmp_path / 'states.db'))
+
+
+@pytest.fixture
+def app(store, make_container):
+    """App with a callback that reads the field, slowly, and one that writes it"""
+    import dash
+    import dash_html_components as html
+    from dash.dependencies import Input, Output
+
+    app, container = make_container(SCHEMA, state_store=store)
+    app.layout = html.Div([container] + [html.Div(id=i) for i in ('read', 'write', 'fail', 'read-in', 'write-in', 'fail-in')])
+
+    @app.callback(Output('read', 'children'), [Input('read-in', 'children')])
+    def read(delay):
+        value = container.data[FIELD]['value']
+        time.sleep(delay or 0)
+        return value
+
+    @app.callback(Output('write', 'children'), [Input('write-in', 'children')])
+    def write(value):
+        container.set_field_value(FIELD, value)
+        return value
+
+    @app.callback(Output('fail', 'children'), [Input('fail-in', 'children')])
+    def fail(value):
+        container.set_field_value(FIELD, value)
+        raise dash.exceptions.PreventUpdate
+
+    app.container = container
+    return app
+
+
+def call(app, output, value, session=None):
+    """Run a callback of app in a session, returning its output and the session id"""
+    client = app.server.test_client(use_cookies=False)
+    response = client.post(
+        '/_dash-update-component',
+        json={
+            'output': f'{output}.children',
+            'outputs': {'id': output, 'property': 'children'},
+            'inputs': [{'id': f'{output}-in', 'property': 'children', 'value': value}],
+            'changedPropIds': [f'{output}-in.children']
+        },
+        headers={'Cookie': f'{SESSION_COOKIE}={session}'} if session else {}
+    )
+    for header in response.headers.getlist('Set-Cookie'):
+        if header.startswith(SESSION_COOKIE + '='):
+            session = header.split(';')[0].split('=', 1)[1]
+    if response.status_code == 204:
+        return None, session
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['response'][output]['children'], session
+
+
+def test_state_kept_across_requests(app):
+    _, session = call(app, 'write', 5)
+    _, other = call(app, 'write', 7)
+    assert call(app, 'read', 0, session)[0] == 5
+    assert call(app, 'read', 0, other)[0] == 7
+    # Outside of requests the default state is unchanged
+    assert app.container.data[FIELD]['value'] is None
+
+
+def test_concurrent_requests_keep_changes(app):
+    _, session = call(app, 'read', 0)
+    slow_read = threading.Thread(target=call, args=(app, 'read', 0.3, session))
+    slow_read.start()
+    time.sleep(0.05)
+    # Saved when the slow read, which loaded the state before, has ended
+    call(app, 'write', 5, session)
+    slow_read.join()
+    assert call(app, 'read', 0, session)[0] == 5
+
+
+def test_lock_released_after_failed_request(app):
+    app.container.state_store.lock_timeout = 1
+    _, session = call(app, 'write', 5)
+    assert call(app, 'fail', 6, session) == (None, session)
+    assert call(app, 'read', 0, session)[0] == 6
+
+
+def test_unchanged_state_not_written(tmp_path, make_container):
+    path = str(tmp_path / 'states.db')
+    store = SQLiteStateStore(path)
+    app, container = make_container(SCHEMA, state_store=store)
+    server = app.server
+    with server.test_request_context(headers={'Cookie': f'{SESSION_COOKIE}=s1'}):
+        server.preprocess_request()
+        container.set_field_value(FIELD, 5)
+        server.process_response(server.response_class())
+
+    def saved():
+        with sqlite3.connect(path) as connection:
+            return connection.execute('SELECT state, updated FROM states WHERE key = ?', ('f:s1',)).fetchone()
+
+    before = saved()
+    with server.test_request_context(headers={'Cookie': f'{SESSION_COOKIE}=s1'}):
+        server.preprocess_request()
+        assert container.data[FIELD]['value'] == 5
+        server.process_response(server.response_class())
+    assert saved() == before
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM locks').fetchone()[0] == 0
+
+
+def test_data_setter(make_container):
+    _, container = make_container(SCHEMA)
+    data = {k: dict(v) for k, v in container.data.items()}
+    data[FIELD]['value'] = 'x'
+    container.data = data
+    assert container.data is data
+    assert container.dirty == {FIELD}
+    assert [(e.field, e.rule) for e in container.validate()] == [(FIELD, 'type')]
+
+
+def test_store_methods_are_abstract():
+    with pytest.raises(TypeError):
+        StateStore()